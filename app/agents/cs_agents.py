@@ -1,34 +1,155 @@
-import json
-import random
 import re
 from app.tools.tavily_tools import TavilyMCP
 from app.agents.llm import LLMManager
 from app.prompts.prompts import SupportPrompts
+from app.prompts.prompt_builder import ReplyPromptBuilder
 from app.tools.rag_tools import PolicyReasoningSystem
+from app.tools.keyword_matcher import SUPPORT_MATCHER
+from app.agents.fast_path import FastPathRouter, ORDER_ID_PATTERN
+from app.tools.tracing import tracer
+from app.database.session_store import SQLiteSessionStore
+from app.database.order_repository import get_order_repository
+from app.agents.memory import RollingSummaryMemory
 
 class SupportAgents:
-    def __init__(self):
+    def __init__(self, session_store=None, order_repository=None):
         self.llm_manager = LLMManager()
         self.tavily_mcp = TavilyMCP()
         self.prompts = SupportPrompts()
         self.policy_system = PolicyReasoningSystem(self.llm_manager)
+        self.prompt_builder = ReplyPromptBuilder()
+        self.fast_path = FastPathRouter()
+        self.session_store = session_store or SQLiteSessionStore()
+        self.memory = RollingSummaryMemory(self.llm_manager, self.session_store)
+        self.order_repository = order_repository or get_order_repository()
     
-    def classify_and_handle_query(self, user_query, conversation_history, session_state):
-        """Enhanced query classification with RAG + RAT"""
+    def load_session(self, session_id):
+        """Session state and recent messages from the shared store, for any worker to serve the turn"""
+        return self.session_store.load(session_id)
+    
+    def conversation_context(self, session):
+        """(recent messages, rolling summary) to prompt with; constant size however long the session"""
+        return self.memory.recent_messages(session), self.memory.summary(session)
+    
+    def save_turn(self, session, state, new_messages):
+        """Save the turn's state changes and messages against the session it started from
         
-        if self.tavily_mcp.is_inappropriate_for_support(user_query):
-            return {
-                "type": "inappropriate",
-                "needs_ai_response": True,
-                "context": "User asked inappropriate question for support"
-            }
+        If another worker saved the session in between, the same changes are
+        re-applied on top of the latest version and saved again. Messages are
+        numbered so the summary memory knows which ones it has folded.
+        """
+        changes = {key: value for key, value in state.items() if session["state"].get(key) != value}
+        
+        def apply_changes(latest):
+            latest["state"].update(changes)
+            for message in new_messages:
+                latest["memory"]["count"] += 1
+                latest["messages"].append({**message, "seq": latest["memory"]["count"]})
+        
+        saved = self.session_store.update(session["session_id"], apply_changes, session=session)
+        self.memory.maybe_schedule(saved)
+        return saved
+    
+    def update_session_from_message(self, user_query, conversation_history, session_state):
+        """Pick up an order ID and issue type from the current message before routing it"""
+        order_id = self.extract_order_id(user_query)
+        if order_id and not session_state.get("current_order"):
+            session_state["current_order"] = self.generate_order_data(order_id)
+            session_state["current_ticket"] = f"TKT{order_id}"
+        
+        detected_issue = self.detect_issue_type(user_query, conversation_history)
+        if detected_issue:
+            session_state["issue_type"] = detected_issue
+        
+        return session_state
+    
+    def prepare_turn(self, user_query, conversation_history, session_state, summary=""):
+        """One text turn up to the reply tokens, shared by the Streamlit app and the API service
+        
+        Updates session_state in place (order, ticket, issue type, awaiting_photo)
+        and returns the classify result. Fast-path turns carry the finished reply
+        in "response"; the rest carry the compacted LLM prompt in "prompt".
+        conversation_history and summary come from conversation_context().
+        """
+        self.update_session_from_message(user_query, conversation_history, session_state)
+        query_result = self.classify_and_handle_query(user_query, conversation_history, session_state)
+        
+        if query_result.get("needs_ai_response"):
+            query_result["prompt"] = self.build_ai_prompt(query_result, user_query, conversation_history, session_state, summary)
+        elif query_result["route"] == "photo_request":
+            session_state["awaiting_photo"] = True
+        
+        return query_result
+    
+    def resolve_photo_claim(self, claim, session_state):
+        """Assistant messages for an analyzed photo claim (PhotoAnalysisTools.aggregate_claim)
+        
+        Runs the damage policy decision when damage is confirmed and marks the
+        photo step done in session_state. A claim of None (nothing could be
+        analyzed) only closes the photo step.
+        """
+        if not claim:
+            session_state["awaiting_photo"] = False
+            session_state["photo_received"] = True
+            return []
+        
+        photo_count = claim["photo_count"]
+        messages = ["Photo mil gaya! Analysis kar raha hun..." if photo_count == 1 else f"{photo_count} photos mil gaye! Analysis kar raha hun..."]
+        current_order = session_state.get("current_order") or {}
+        
+        if claim["damage_detected"]:
+            messages.append(f"Damage confirm ho gaya - {claim['damage_severity']} level. Policy check kar raha hun...")
+            
+            policy_decision = self.get_policy_decision_with_reasoning(
+                "damage",
+                {**current_order, "damage_severity": claim['damage_severity']},
+                f"photo damage {claim['damage_severity']}"
+            )
+            
+            if policy_decision["recommendation"] == "process_refund":
+                messages.append(f"Policy ke according full refund approve ho gaya! ₹{current_order.get('amount')} refund process kar raha hun. 2-3 days mein account mein aa jayega.")
+            elif policy_decision["recommendation"] == "offer_replacement":
+                messages.append("Replacement arrange kar raha hun. Same day delivery hoga!")
+            else:
+                messages.append("Admin approval leke solution dunga. Wait karo please.")
+        else:
+            messages.append("Photo mein clear damage nahi dikh raha, but customer satisfaction important hai. Replacement arrange kar raha hun.")
         
-        if self.tavily_mcp.should_search_price(user_query):
-            return self.handle_price_query(user_query, session_state)
+        session_state["awaiting_photo"] = False
+        session_state["photo_received"] = True
+        return messages
+    
+    def classify_and_handle_query(self, user_query, conversation_history, session_state):
+        """Enhanced query classification with RAG + RAT
+        
+        Routine turns (missing order ID, photo prompts, off-topic questions) are
+        answered by the fast-path router with needs_ai_response False and the
+        reply in "response"; everything else goes on to the LLM.
+        """
         
-        return {"type": "support", "needs_ai_response": True}
+        with tracer.span("classify") as span:
+            # One matcher pass covers the fast path and the price check
+            matched = SUPPORT_MATCHER.match(user_query)
+            
+            fast_reply = self.fast_path.route(user_query, matched, session_state)
+            if fast_reply:
+                route, response = fast_reply
+                span.set(type="fast_path", route=route)
+                return {
+                    "type": "fast_path",
+                    "route": route,
+                    "response": response,
+                    "needs_ai_response": False
+                }
+            
+            if "price" in matched:
+                result = self.handle_price_query(user_query, session_state)
+            else:
+                result = {"type": "support", "needs_ai_response": True}
+            span.set(type=result["type"])
+            return result
     
-    def get_policy_decision_with_reasoning(self, issue_type, order_data, user_query):
+    def get_policy_decision_with_reasoning(self, issue_type, order_data, user_query, reasoning_mode=None):
         """Use RAG + RAT for policy decisions"""
         
         if not issue_type or not order_data:
@@ -39,7 +160,7 @@ class SupportAgents:
             }
         
         policy_result = self.policy_system.process_policy_query(
-            issue_type, order_data, user_query
+            issue_type, order_data, user_query, reasoning_mode
         )
         
         return policy_result
@@ -47,7 +168,7 @@ class SupportAgents:
     def handle_price_query(self, user_query, session_state):
         """Handle price queries with Tavily MCP"""
         product_name = self.extract_product_name(user_query)
-        location = session_state.get('current_order', {}).get('user_location', '')
+        location = (session_state.get('current_order') or {}).get('user_location', '')
         
         price_result = self.tavily_mcp.search_product_price(product_name, location)
         
@@ -67,13 +188,19 @@ class SupportAgents:
     
     def get_ai_response_with_context(self, query_result, user_query, conversation_history, session_state):
         """Get AI response with RAG + RAT context"""
+        ai_prompt = self.build_ai_prompt(query_result, user_query, conversation_history, session_state)
+        return self.llm_manager.get_support_response(ai_prompt)
+    
+    def stream_ai_response_with_context(self, query_result, user_query, conversation_history, session_state):
+        """Same as get_ai_response_with_context, yielding tokens as they arrive"""
+        ai_prompt = self.build_ai_prompt(query_result, user_query, conversation_history, session_state)
+        return self.llm_manager.stream_support_response(ai_prompt)
+    
+    def build_ai_prompt(self, query_result, user_query, conversation_history, session_state, summary=""):
+        """Build the reply prompt with RAG + RAT context, compacted to the input-token budget"""
         
-        context = f"""
-        USER_QUERY: "{user_query}"
-        QUERY_TYPE: {query_result["type"]}
-        CONVERSATION_HISTORY: {conversation_history[-2:] if len(conversation_history) >= 2 else conversation_history}
-        SESSION_STATE: {session_state}
-        """
+        policy_decision = None
+        extra_context = ""
         
         if (query_result["type"] == "support" and 
             session_state.get("issue_type") and 
@@ -84,38 +211,32 @@ class SupportAgents:
                 session_state.get("current_order"),
                 user_query
             )
-            context += f"\nRAG_RAT_POLICY_REASONING: {json.dumps(policy_decision, indent=2)}"
         
         # Add context for other query types
-        elif query_result["type"] == "inappropriate":
-            context += f"\nCONTEXT: {query_result.get('context', '')}"
         elif query_result["type"] == "price_search":
-            context += f"\nPRICE_INFO: {query_result['price_info']}\nPRODUCT: {query_result['product_name']}"
+            extra_context = f"PRICE_INFO: {query_result['price_info']}\nPRODUCT: {query_result['product_name']}"
         elif query_result["type"] == "price_search_failed":
-            context += f"\nPRODUCT: {query_result['product_name']} (price search failed)"
-        
-        ai_prompt = f"""
-        {context}
+            extra_context = f"PRODUCT: {query_result['product_name']} (price search failed)"
         
-        You are a Swiggy Support Agent. Think naturally about this situation:
-        
-        RESPONSE RULES:
-        - Maximum 1-2 sentences only
-        - Use same language as user (Hindi for Hindi, English for English)
-        - Think what a real support person would say
-        - Don't use templates, think naturally
-        - If RAG + RAT policy reasoning is provided, use it to inform your response
+        ai_prompt, stats = self.prompt_builder.build(
+            user_query,
+            query_result["type"],
+            conversation_history,
+            session_state,
+            policy_decision,
+            extra_context,
+            summary
+        )
         
-        SPECIFIC GUIDANCE:
-        - For inappropriate questions: Politely redirect to support topics in user's language
-        - For price questions: Share the price info naturally and ask if they want to order
-        - For support questions with policy reasoning: Use the RAG + RAT recommendation
-        - If you need order ID to help, ask for it first - don't claim to check without it
+        # Per-turn stats travel with the turn; the agents object is shared by every session
+        query_result["prompt_stats"] = stats
+        tracer.registry.inc("support_reply_prompts_total", 1, "Reply prompts built")
+        tracer.registry.inc("support_reply_prompt_tokens_total", stats["input_tokens"],
+                            "Reply prompt input tokens, and tokens saved by compaction", kind="input")
+        tracer.registry.inc("support_reply_prompt_tokens_total", stats["saved_tokens"],
+                            "Reply prompt input tokens, and tokens saved by compaction", kind="saved")
         
-        Think and respond naturally in 1-2 sentences based on the context.
-        """
-        
-        return self.llm_manager.get_support_response(ai_prompt)
+        return ai_prompt
     
     def extract_product_name(self, query):
         """Extract product name from price query"""
@@ -126,36 +247,22 @@ class SupportAgents:
     
     def extract_order_id(self, text):
         """Extract order ID from text"""
-        match = re.search(r'(\d{4,8})', text)
-        return match.group(1) if match else None
+        match = ORDER_ID_PATTERN.search(text)
+        return match.group(0) if match else None
     
     def generate_order_data(self, order_id):
-        """Generate realistic order data for prototype"""
-        products = [
-            "iPhone 14 Mobile Cover", "Samsung Galaxy Cover", "OnePlus Case Black",
-            "Mobile Screen Protector", "Phone Charger Cable", "Bluetooth Earphones",
-            "Power Bank 10000mAh", "Phone Stand", "Car Phone Holder"
-        ]
-        
-        return {
-            "order_id": order_id,
-            "product_name": random.choice(products),
-            "amount": random.randint(199, 799),
-            "status": random.choice(["delivered", "in_transit", "processing"]),
-            "payment_method": random.choice(["UPI", "Card", "COD"]),
-            "delivery_date": "2025-08-" + str(random.randint(18, 25)),
-            "user_location": random.choice(["Mumbai", "Delhi", "Bangalore"])
-        }
+        """Order details from the orders table, or deterministic prototype data for unknown IDs"""
+        return self.order_repository.get_order(order_id)
     
     def detect_issue_type(self, user_query, conversation_history):
         """Detect issue type from conversation"""
-        query_lower = user_query.lower()
+        matched = SUPPORT_MATCHER.match(user_query)
         
-        if any(word in query_lower for word in ["damage", "broken", "crack", "kharab"]):
+        if "issue_damage" in matched:
             return "damage"
-        elif any(word in query_lower for word in ["nahi mila", "not received", "nahi aaya", "missing"]):
+        elif "issue_missing" in matched:
             return "missing"
-        elif any(word in query_lower for word in ["wrong", "galat", "different", "alag"]):
+        elif "issue_wrong" in matched:
             return "wrong"
         
         return None
@@ -0,0 +1,111 @@
+import re
+import threading
+from collections import Counter
+from app.tools.keyword_matcher import TOKEN_PATTERN, HINGLISH_VARIANTS
+
+DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+ORDER_ID_PATTERN = re.compile(r"\d{4,8}")
+
+# Matcher categories that make a turn a support request even if it also trips "inappropriate"
+SUPPORT_CATEGORIES = ("issue_damage", "issue_missing", "issue_wrong", "policy")
+
+# Variant spellings that are also everyday English words, so never evidence of Hindi
+ENGLISH_HOMOGRAPHS = {"he", "h", "mile"}
+
+# Romanized Hindi words common enough in support chats to decide the reply language
+HINGLISH_MARKERS = ({
+    "mera", "meri", "mere", "mujhe", "hai", "hain", "tha", "thi", "nahi", "kya", "kab",
+    "kaise", "kyun", "karo", "kar", "kardo", "bhai", "yaar", "abhi", "aur", "bhi",
+    "toot", "tut", "tuta", "tooti", "galat", "alag", "kharab", "mila", "aaya", "gaya",
+} | {spelling for spellings in HINGLISH_VARIANTS.values() for spelling in spellings}) - ENGLISH_HOMOGRAPHS
+
+FAST_PATH_REPLIES = {
+    "inappropriate": {
+        "hi": "Main sirf Swiggy orders mein help kar sakta hun. Aapke order mein koi problem hai?",
+        "en": "I can only help with your Swiggy orders. Is there a problem with one of them?"
+    },
+    "order_id_needed": {
+        "hi": "Sorry for the trouble! Order ID share karo please, main turant check karta hun.",
+        "en": "Sorry about that! Please share your order ID so I can check it right away."
+    },
+    "photo_request": {
+        "hi": "Damage ki photo share karo please, main verify kar ke solution dunga!",
+        "en": "Please share a photo of the damage so I can verify it and sort this out."
+    },
+    "photo_pending": {
+        "hi": "Upar se damage ki photo upload karo please, uske baad main turant solution dunga.",
+        "en": "Please upload the damage photo above and I'll resolve this right away."
+    },
+}
+
+LLM_ROUTE = "llm"
+
+
+def detect_language(text):
+    """'hi' for Devanagari or romanized Hindi, otherwise 'en'"""
+    if DEVANAGARI.search(text):
+        return "hi"
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    return "hi" if any(token in HINGLISH_MARKERS for token in tokens) else "en"
+
+
+class FastPathRouter:
+    """Answers routine support turns from session state and matcher output without an LLM call
+
+    Routes are checked in order and the first that applies wins; anything
+    open-ended (price questions, policy decisions, follow-ups) returns None so
+    the caller falls back to the model. Hits are counted per route, with LLM
+    fallbacks under "llm", so the fast-path hit rate can be monitored.
+    """
+
+    def __init__(self, replies=None):
+        self.replies = replies or FAST_PATH_REPLIES
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def route(self, user_query, matched, session_state):
+        """Return (route, reply) for a routine turn, or None to use the LLM
+
+        session_state must already reflect the current message (order ID and
+        issue type picked up from it).
+        """
+        route = self._select_route(user_query, matched, session_state)
+        with self._lock:
+            self.counts[route or LLM_ROUTE] += 1
+        if route is None:
+            return None
+        return route, self.replies[route][detect_language(user_query)]
+
+    def _select_route(self, user_query, matched, session_state):
+        # An off-topic word inside a real complaint ("my sports shoes arrived damaged") is not off-topic
+        if "inappropriate" in matched and not (
+            any(category in matched for category in SUPPORT_CATEGORIES) or ORDER_ID_PATTERN.search(user_query)
+        ):
+            return "inappropriate"
+
+        if "price" in matched:
+            return None
+
+        issue_type = session_state.get("issue_type")
+        has_order = bool(session_state.get("current_order"))
+
+        if session_state.get("awaiting_photo"):
+            # Questions while a photo is pending still deserve a real answer
+            return None if "?" in user_query else "photo_pending"
+
+        if issue_type and not has_order:
+            return "order_id_needed"
+
+        if issue_type == "damage" and has_order and not session_state.get("photo_received"):
+            return "photo_request"
+
+        return None
+
+    def stats(self):
+        """Per-route hits and share of all routed turns"""
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                route: {"hits": hits, "rate": hits / total}
+                for route, hits in self.counts.items()
+            }
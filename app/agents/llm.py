@@ -1,52 +1,36 @@
 import os
-from groq import Groq
+import json
+import time
+import random
+import asyncio
 from dotenv import load_dotenv
+from app.tools.tracing import tracer
 
 load_dotenv()
 
-class LLMManager:
-    def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.supervisor_model = "llama-3.3-70b-versatile"
-        self.support_model = "llama-3.3-70b-versatile"
-    
-    def get_supervisor_analysis(self, prompt, temperature=0.2, max_tokens=800):
-        """Get supervisor analysis for RAG + RAT reasoning"""
-        try:
-            response = self.groq_client.chat.completions.create(
-                model=self.supervisor_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are the Supervisor for Swiggy Instamart Support Team with RAG + RAT capabilities.
-                        
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+# Same convention as the Groq SDK: GROQ_BASE_URL is the host, the API lives under /openai/v1
+DEFAULT_BASE_URL = "https://api.groq.com"
+CHAT_COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+SUPERVISOR_SYSTEM_PROMPT = """You are the Supervisor for Swiggy Instamart Support Team with RAG + RAT capabilities.
+
                         Your role:
                         - Analyze user queries and situations systematically
                         - Perform step-by-step reasoning through policies (RAT)
                         - Make data-driven decisions based on retrieved policies (RAG)
                         - Provide detailed analysis for support agents
-                        
+
                         Think step by step and provide thorough analysis."""
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"ANALYSIS_ERROR: {str(e)}\nUser needs empathetic support response."
-    
-    def get_support_response(self, prompt, temperature=0.4, max_tokens=200):
-        """Get support response - enhanced for empathy"""
-        try:
-            response = self.groq_client.chat.completions.create(
-                model=self.support_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are a Swiggy Instamart Support Agent with maximum empathy.
-                        
+
+STRUCTURED_SYSTEM_PROMPT = """You are the Supervisor for Swiggy Instamart Support Team with RAG + RAT capabilities.
+
+                        Reason through the situation and the retrieved policies, then answer
+                        with a single JSON object that matches the schema in the user message.
+                        Output JSON only, no prose outside the object."""
+
+SUPPORT_SYSTEM_PROMPT = """You are a Swiggy Instamart Support Agent with maximum empathy.
+
                         Core behavior:
                         - Think naturally like a real human support person
                         - Show genuine empathy and understanding
@@ -54,14 +38,355 @@ class LLMManager:
                         - Provide 1-2 sentence responses that feel caring and helpful
                         - Use RAG + RAT policy reasoning when provided
                         - NO TEMPLATES - pure AI reasoning for each response
-                        
+
                         You have access to advanced policy reasoning system to help customers better."""
-                    },
+
+SUMMARY_SYSTEM_PROMPT = """You maintain the running case notes for a Swiggy Instamart support conversation.
+
+                        Merge the new messages into the existing notes. Keep order IDs, products,
+                        the issue, evidence shared, decisions and promises made, open questions and
+                        the customer's language and mood. Drop greetings and repetition.
+                        Answer with the updated notes only, in plain sentences."""
+
+SUPPORT_FALLBACK_RESPONSE = "Main aapki help karna chahta hun! Technical issue hai, main solve kar raha hun."
+
+
+ANALYSIS_ERROR_PREFIX = "ANALYSIS_ERROR:"
+
+
+def analysis_error_message(error):
+    return f"{ANALYSIS_ERROR_PREFIX} {str(error)}\nUser needs empathetic support response."
+
+
+def new_stream_stats(stats=None):
+    """Reset (or create) the per-call dict a streaming reply reports its timings in"""
+    stats = {} if stats is None else stats
+    stats.update(ttft_ms=None, total_ms=None, chunks=0)
+    return stats
+
+
+def is_analysis_error(text):
+    """True for the placeholder analysis_error_message returns instead of raising"""
+    return isinstance(text, str) and text.startswith(ANALYSIS_ERROR_PREFIX)
+
+
+class LLMManager:
+    def __init__(self):
+        self._groq_client = None
+        self.supervisor_model = DEFAULT_MODEL
+        self.support_model = DEFAULT_MODEL
+
+    @property
+    def groq_client(self):
+        """Groq SDK client, imported and created on the first call rather than at startup"""
+        if self._groq_client is None:
+            from groq import Groq
+
+            self._groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        return self._groq_client
+
+    def _complete(self, model, system_prompt, prompt, temperature, max_tokens, **extra):
+        """One chat completion; token usage from the response is recorded on the span"""
+        response = self.groq_client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **extra
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            tracer.record_tokens(model, usage.prompt_tokens, usage.completion_tokens)
+        return response.choices[0].message.content
+
+    def get_supervisor_analysis(self, prompt, temperature=0.2, max_tokens=800):
+        """Get supervisor analysis for RAG + RAT reasoning"""
+        with tracer.span("llm.supervisor") as span:
+            try:
+                return self._complete(self.supervisor_model, SUPERVISOR_SYSTEM_PROMPT,
+                                      prompt, temperature, max_tokens)
+            except Exception as e:
+                span.fail(e)
+                return analysis_error_message(e)
+
+    def get_structured_analysis(self, prompt, temperature=0.2, max_tokens=800):
+        """Get supervisor analysis as a parsed JSON object (None on failure)"""
+        with tracer.span("llm.structured") as span:
+            try:
+                return json.loads(self._complete(self.supervisor_model, STRUCTURED_SYSTEM_PROMPT,
+                                                 prompt, temperature, max_tokens,
+                                                 response_format={"type": "json_object"}))
+            except Exception as e:
+                span.fail(e)
+                print(f"Structured analysis error: {str(e)}")
+                return None
+
+    def get_support_response(self, prompt, temperature=0.4, max_tokens=200):
+        """Get support response - enhanced for empathy"""
+        with tracer.span("llm.support") as span:
+            try:
+                return self._complete(self.support_model, SUPPORT_SYSTEM_PROMPT,
+                                      prompt, temperature, max_tokens)
+            except Exception as e:
+                span.fail(e)
+                return SUPPORT_FALLBACK_RESPONSE
+
+    def get_summary(self, prompt, temperature=0.1, max_tokens=200):
+        """Updated rolling conversation summary (None on failure, so the old one is kept)"""
+        with tracer.span("llm.summary") as span:
+            try:
+                return self._complete(self.supervisor_model, SUMMARY_SYSTEM_PROMPT,
+                                      prompt, temperature, max_tokens)
+            except Exception as e:
+                span.fail(e)
+                print(f"Summary error: {str(e)}")
+                return None
+
+    def stream_support_response(self, prompt, temperature=0.4, max_tokens=200, stats=None):
+        """Yield the support response token by token
+
+        Pass a dict as stats to get this call's ttft_ms, total_ms and chunks
+        filled in; the manager is shared by every session, so it keeps none.
+        """
+        start = time.perf_counter()
+        stats = new_stream_stats(stats)
+        with tracer.stream_span("llm.stream") as span:
+            try:
+                stream = self.groq_client.chat.completions.create(
+                    model=self.support_model,
+                    messages=[
+                        {"role": "system", "content": SUPPORT_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+                for chunk in stream:
+                    # Groq reports usage on the final chunk
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if usage is not None:
+                        tracer.record_tokens(self.support_model, usage.prompt_tokens, usage.completion_tokens,
+                                             span=span)
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    if stats["ttft_ms"] is None:
+                        stats["ttft_ms"] = (time.perf_counter() - start) * 1000
+                    stats["chunks"] += 1
+                    yield delta
+            except Exception as e:
+                span.fail(e)
+                if stats["chunks"] == 0:
+                    stats["ttft_ms"] = (time.perf_counter() - start) * 1000
+                    yield SUPPORT_FALLBACK_RESPONSE
+            finally:
+                stats["total_ms"] = (time.perf_counter() - start) * 1000
+                span.set(ttft_ms=round(stats["ttft_ms"] or 0.0, 3), chunks=stats["chunks"])
+
+
+class AsyncLLMManager:
+    """asyncio LLM client on a shared keep-alive httpx pool, for any OpenAI-compatible endpoint
+
+    At most max_in_flight requests run at once. 429/5xx responses and transport
+    errors are retried with jittered exponential backoff.
+    """
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_key=None, base_url=None, max_in_flight=None, max_retries=3,
+                 timeout=30.0, backoff_base=0.5, backoff_max=8.0):
+        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+        self.base_url = (base_url or os.getenv("GROQ_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.max_in_flight = max_in_flight or int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.supervisor_model = DEFAULT_MODEL
+        self.support_model = DEFAULT_MODEL
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._client = None
+
+    @property
+    def client(self):
+        """Shared pooled client, created on first use inside the running loop"""
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_in_flight,
+                    max_keepalive_connections=self.max_in_flight,
+                    keepalive_expiry=60.0
+                )
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than a server Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    async def chat_completion(self, model, messages, temperature, max_tokens, timeout=None, **extra):
+        """POST chat completions with bounded concurrency and retries; returns the JSON body"""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **extra
+        }
+
+        import httpx
+
+        with tracer.span("llm.request", model=model) as span:
+            async with self._semaphore:
+                for attempt in range(self.max_retries + 1):
+                    span.set(attempts=attempt + 1)
+                    retry_after = None
+                    try:
+                        response = await self.client.post(CHAT_COMPLETIONS_PATH, json=payload, timeout=timeout or self.timeout)
+                    except httpx.TransportError as e:
+                        error = e
+                    else:
+                        if response.status_code not in self.RETRY_STATUS_CODES:
+                            response.raise_for_status()
+                            body = response.json()
+                            usage = body.get("usage") or {}
+                            tracer.record_tokens(model, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                            return body
+                        error = httpx.HTTPStatusError(
+                            f"Retryable status {response.status_code}", request=response.request, response=response
+                        )
+                        retry_after = self._retry_after(response)
+
+                    if attempt < self.max_retries:
+                        await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+
+                raise error
+
+    async def get_supervisor_analysis(self, prompt, temperature=0.2, max_tokens=800, timeout=None):
+        """Get supervisor analysis for RAG + RAT reasoning"""
+        try:
+            body = await self.chat_completion(
+                self.supervisor_model,
+                [
+                    {"role": "system", "content": SUPERVISOR_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=temperature,
-                max_tokens=max_tokens
+                temperature, max_tokens, timeout
             )
-            return response.choices[0].message.content
+            return body["choices"][0]["message"]["content"]
         except Exception as e:
-            return "Main aapki help karna chahta hun! Technical issue hai, main solve kar raha hun."
+            return analysis_error_message(e)
+
+    async def get_structured_analysis(self, prompt, temperature=0.2, max_tokens=800, timeout=None):
+        """Get supervisor analysis as a parsed JSON object (None on failure)"""
+        try:
+            body = await self.chat_completion(
+                self.supervisor_model,
+                [
+                    {"role": "system", "content": STRUCTURED_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature, max_tokens, timeout,
+                response_format={"type": "json_object"}
+            )
+            return json.loads(body["choices"][0]["message"]["content"])
+        except Exception as e:
+            print(f"Structured analysis error: {str(e)}")
+            return None
+
+    async def get_support_response(self, prompt, temperature=0.4, max_tokens=200, timeout=None):
+        """Get support response - enhanced for empathy"""
+        try:
+            body = await self.chat_completion(
+                self.support_model,
+                [
+                    {"role": "system", "content": SUPPORT_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature, max_tokens, timeout
+            )
+            return body["choices"][0]["message"]["content"]
+        except Exception as e:
+            return SUPPORT_FALLBACK_RESPONSE
+
+    async def stream_support_response(self, prompt, temperature=0.4, max_tokens=200, timeout=None, stats=None):
+        """Async-iterate the support response token by token from the SSE stream
+
+        Streams are not retried once started. Pass a dict as stats to get this
+        call's timings, as with LLMManager.stream_support_response.
+        """
+        start = time.perf_counter()
+        stats = new_stream_stats(stats)
+        payload = {
+            "model": self.support_model,
+            "messages": [
+                {"role": "system", "content": SUPPORT_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        with tracer.stream_span("llm.stream", model=self.support_model) as span:
+            try:
+                async with self._semaphore:
+                    async with self.client.stream("POST", CHAT_COMPLETIONS_PATH, json=payload,
+                                                  timeout=timeout or self.timeout) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                break
+                            event = json.loads(data)
+                            usage = (event.get("x_groq") or {}).get("usage") or event.get("usage")
+                            if usage:
+                                tracer.record_tokens(self.support_model, usage.get("prompt_tokens"),
+                                                     usage.get("completion_tokens"), span=span)
+                            choices = event.get("choices") or [{}]
+                            delta = choices[0].get("delta", {}).get("content")
+                            if not delta:
+                                continue
+                            if stats["ttft_ms"] is None:
+                                stats["ttft_ms"] = (time.perf_counter() - start) * 1000
+                            stats["chunks"] += 1
+                            yield delta
+            except Exception as e:
+                span.fail(e)
+                if stats["chunks"] == 0:
+                    stats["ttft_ms"] = (time.perf_counter() - start) * 1000
+                    yield SUPPORT_FALLBACK_RESPONSE
+            finally:
+                stats["total_ms"] = (time.perf_counter() - start) * 1000
+                span.set(ttft_ms=round(stats["ttft_ms"] or 0.0, 3), chunks=stats["chunks"])
@@ -0,0 +1,105 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.prompts.prompt_builder import RECENT_WINDOW_MESSAGES, compact_json, clip_text
+from app.tools.tracing import tracer
+
+# Messages left verbatim after a fold. A fold starts once keep + 2 * every_turns messages
+# are unsummarized, and at the latest with one turn of room left in RECENT_WINDOW_MESSAGES:
+# it runs in the background, so the next turn adds 2 more before it lands. With the
+# defaults (keep 2, every 2 turns) that is 6 of 8, so the prompt never skips a message
+# as long as each fold finishes within a turn
+SUMMARY_KEEP_MESSAGES = 2
+SUMMARY_MAX_CHARS = 800
+SUMMARY_MESSAGE_CHARS = 300
+
+
+class RollingSummaryMemory:
+    """Constant-size conversation memory: a running summary plus the recent messages
+
+    Every few turns the messages that have aged out of the recent window are
+    folded into the session's summary by one LLM call on a background thread,
+    so the reply path never waits on summarization. The summary is saved through
+    the session store like any other turn change, so any worker can pick it up.
+    """
+
+    def __init__(self, llm_manager, session_store, every_turns=None, keep_messages=SUMMARY_KEEP_MESSAGES,
+                 max_chars=SUMMARY_MAX_CHARS):
+        self.llm_manager = llm_manager
+        self.session_store = session_store
+        self.every_turns = every_turns or int(os.getenv("SUMMARY_EVERY_TURNS", "2"))
+        self.keep_messages = keep_messages
+        self.fold_at = min(keep_messages + 2 * self.every_turns, RECENT_WINDOW_MESSAGES - 2)
+        self.max_chars = max_chars
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary-memory")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def summary(self, session):
+        return session["memory"]["summary"]
+
+    def recent_messages(self, session):
+        """Messages not yet in the summary, newest last, capped at the prompt window"""
+        through = session["memory"]["through"]
+        return [message for message in session["messages"] if message.get("seq", 0) > through][-RECENT_WINDOW_MESSAGES:]
+
+    def _foldable(self, session):
+        """Unsummarized messages older than the ones kept verbatim"""
+        memory = session["memory"]
+        cutoff = memory["count"] - self.keep_messages
+        return [message for message in session["messages"] if memory["through"] < message.get("seq", 0) <= cutoff]
+
+    def maybe_schedule(self, session):
+        """Start a background fold once fold_at messages are unsummarized"""
+        memory = session["memory"]
+        if memory["count"] - memory["through"] < self.fold_at or not self._foldable(session):
+            return None
+        session_id = session["session_id"]
+        with self._lock:
+            if session_id in self._in_flight:
+                return None
+            self._in_flight.add(session_id)
+        return self._executor.submit(self._fold, session_id)
+
+    def _fold(self, session_id):
+        try:
+            with tracer.span("memory.summarize") as span:
+                session = self.session_store.load(session_id)
+                foldable = self._foldable(session)
+                if not foldable:
+                    return
+                summary = self.llm_manager.get_summary(self._summary_prompt(self.summary(session), foldable))
+                span.set(messages=len(foldable))
+                if not summary:
+                    span.set(kept_previous=True)
+                    return
+
+                summary = clip_text(summary, self.max_chars)
+                through = foldable[-1]["seq"]
+
+                def apply_changes(latest):
+                    # A fold from another worker may already have got further
+                    if latest["memory"]["through"] < through:
+                        latest["memory"]["summary"] = summary
+                        latest["memory"]["through"] = through
+
+                self.session_store.update(session_id, apply_changes, session=session)
+        except Exception as e:
+            print(f"Summary memory error: {str(e)}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(session_id)
+
+    def _summary_prompt(self, previous_summary, messages):
+        new_messages = [
+            {"role": message["role"], "content": clip_text(message["content"], SUMMARY_MESSAGE_CHARS)}
+            for message in messages
+        ]
+        return (
+            f"CURRENT_NOTES: {previous_summary or '(none yet)'}\n"
+            f"NEW_MESSAGES: {compact_json(new_messages)}\n\n"
+            f"Return the updated notes in at most {self.max_chars // 6} words."
+        )
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
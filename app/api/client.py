@@ -0,0 +1,52 @@
+import json
+import requests
+
+
+class SupportAPIClient:
+    """Blocking client for app.api.server, used by the Streamlit app in thin-client mode"""
+
+    def __init__(self, base_url, timeout=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def stream_turn(self, session_id, message):
+        """Yield the turn's events (route, token..., done) as they arrive"""
+        response = self.session.post(
+            f"{self.base_url}/v1/turn/stream",
+            json={"session_id": session_id, "message": message},
+            stream=True,
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data:"):
+                    yield json.loads(line[len("data:"):])
+
+    def get_history(self, session_id, before=None, limit=20):
+        """One page of the session's conversation log (DatabaseManager.get_history format)"""
+        params = {"limit": limit}
+        if before:
+            params["before"] = before
+        response = self.session.get(f"{self.base_url}/v1/sessions/{session_id}/history",
+                                    params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def upload_photos(self, session_id, uploaded_files):
+        """Send the claim photos; returns {"messages", "state", "claim"} or {"errors"}"""
+        files = [
+            ("files", (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type))
+            for uploaded_file in uploaded_files
+        ]
+        response = self.session.post(
+            f"{self.base_url}/v1/sessions/{session_id}/photos",
+            files=files,
+            timeout=self.timeout
+        )
+        if response.status_code == 422:
+            body = response.json()
+            return {"errors": body.get("errors") or [str(body.get("detail"))]}
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,306 @@
+"""Headless chat service: the Streamlit turn flow as a JSON, SSE and WebSocket API.
+
+Every endpoint runs the same turn as the Streamlit app. SupportAgents.prepare_turn
+updates the session and routes the message; a fast-path reply or the policy
+reasoning and prompt come from it. The reply is then streamed from the LLM
+on the event loop. Session state and recent messages live in the shared
+session store, so any worker can serve any turn without sticky routing.
+
+    POST /v1/turn                          one turn, whole reply as JSON
+    POST /v1/turn/stream                   one turn as server-sent events
+    WS   /v1/ws                            one turn per JSON message, events back
+    GET  /v1/sessions/{session_id}/history one page of the conversation log
+    POST /v1/sessions/{session_id}/photos  multipart damage photos for the claim
+    GET  /health, GET /metrics
+
+Run from the repo root:
+    python -m app.api.server --workers 4 --port 8000
+"""
+import os
+import json
+import asyncio
+import argparse
+import uuid
+from contextlib import aclosing, asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, File, Query, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.agents.cs_agents import SupportAgents
+from app.agents.llm import AsyncLLMManager
+from app.database.db_manager import DatabaseManager
+from app.database.models import DatabaseModels
+from app.tools.database_tools import DatabaseTools
+from app.tools.photo_analysis import PhotoAnalysisTools, start_photo_pool
+from app.tools.tracing import tracer, TraceSink
+
+class TurnRequest(BaseModel):
+    session_id: Optional[str] = None
+    message: str = Field(min_length=1, max_length=4000)
+
+
+class _Upload:
+    """Adapts a Starlette UploadFile to the Streamlit UploadedFile interface DatabaseTools expects"""
+
+    def __init__(self, upload, size):
+        self.name = upload.filename or "photo"
+        self.type = upload.content_type
+        self.size = size
+        self._file = upload.file
+
+    def seek(self, offset):
+        return self._file.seek(offset)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+
+class SupportService:
+    """Shared components for one worker process plus the turn flow over them"""
+
+    def __init__(self):
+        DatabaseModels()
+        self.agents = SupportAgents()
+        self.db_manager = DatabaseManager()
+        self.db_tools = DatabaseTools()
+        self.photo_tools = PhotoAnalysisTools()
+        start_photo_pool()
+        self.llm = AsyncLLMManager()
+        tracer.add_sink(TraceSink(self.db_manager.writer))
+        tracer.registry.register_gauge(
+            "support_session_cache", lambda: {(("stat", key),): value for key, value in self.agents.session_store.cache.stats().items()},
+            "Session store read-through cache counters in this worker"
+        )
+        tracer.registry.register_gauge(
+            "support_order_cache", lambda: {(("stat", key),): value for key, value in self.agents.order_repository.cache.stats().items()},
+            "Order repository cache counters in this worker"
+        )
+
+    async def aclose(self):
+        await self.llm.aclose()
+        self.agents.policy_system.rag_engine.stop_watching()
+        await asyncio.to_thread(self.agents.memory.shutdown)
+        self.db_manager.writer.flush()
+
+    def save_message(self, session_id, role, content, state):
+        order_id = (state.get("current_order") or {}).get("order_id")
+        self.db_manager.save_conversation_with_rag_rat(
+            content,
+            role,
+            None,
+            {"issue_type": state.get("issue_type")},
+            session_id=session_id,
+            ticket_id=state.get("current_ticket"),
+            order_id=order_id
+        )
+
+    async def serve_turn(self, request, send):
+        """Run one turn, passing each event to await send(event); a failure sends an error event
+
+        The turn trace is opened here, around the event generator, and the
+        generator is closed explicitly. A generator that held the trace itself
+        would be finalized wherever the consumer dropped it, and resetting its
+        context variable there fails, losing the trace and metrics.
+        """
+        session_id = request.session_id or str(uuid.uuid4())
+        with tracer.turn(session_id=session_id) as turn:
+            events = self.run_turn(request, session_id, turn)
+            try:
+                while True:
+                    try:
+                        event = await anext(events)
+                    except StopAsyncIteration:
+                        break
+                    except Exception as e:
+                        # A failed turn ends with an error event, not a dropped stream or socket
+                        turn.error = f"{type(e).__name__}: {e}"
+                        print(f"Turn failed: {str(e)}")
+                        await send({"event": "error", "session_id": session_id,
+                                    "error": "The reply could not be completed, please try again"})
+                        break
+                    await send(event)
+            finally:
+                await events.aclose()
+
+    async def run_turn(self, request, session_id, turn):
+        """Async-iterate one turn's events: route, then tokens, then done with the updated state"""
+        session = await asyncio.to_thread(self.agents.load_session, session_id)
+        state = dict(session["state"])
+        user_message = {"role": "user", "content": request.message}
+        self.save_message(session_id, "user", request.message, state)
+
+        # Classification and RAT reasoning use the blocking clients, so they run off the loop
+        history, summary = self.agents.conversation_context(session)
+        query_result = await asyncio.to_thread(
+            self.agents.prepare_turn, request.message, history + [user_message], state, summary
+        )
+        route = query_result.get("route") or query_result["type"]
+        turn.set(route=route)
+        yield {"event": "route", "session_id": session_id, "type": query_result["type"], "route": route}
+
+        if query_result.get("needs_ai_response"):
+            chunks = []
+            stream_stats = {}
+            async with aclosing(self.llm.stream_support_response(query_result["prompt"], stats=stream_stats)) as stream:
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    yield {"event": "token", "text": chunk}
+            reply = "".join(chunks)
+            turn.set(ttft_ms=round(stream_stats.get("ttft_ms") or 0.0, 3))
+        else:
+            reply = query_result["response"]
+            yield {"event": "token", "text": reply}
+
+        self.save_message(session_id, "assistant", reply, state)
+        session = await asyncio.to_thread(
+            self.agents.save_turn, session, state, [user_message, {"role": "assistant", "content": reply}]
+        )
+        yield {"event": "done", "session_id": session_id, "reply": reply, "state": session["state"]}
+
+    async def process_photos(self, session_id, uploads):
+        with tracer.turn(session_id=session_id, route="photo_upload"):
+            session = await asyncio.to_thread(self.agents.load_session, session_id)
+            state = dict(session["state"])
+            claim = await asyncio.to_thread(
+                self.photo_tools.analyze_uploaded_claim, self.db_tools, uploads, state.get("current_ticket")
+            )
+            messages = await asyncio.to_thread(self.agents.resolve_photo_claim, claim, state)
+            for message in messages:
+                self.save_message(session_id, "assistant", message, state)
+            session = await asyncio.to_thread(
+                self.agents.save_turn, session, state, [{"role": "assistant", "content": message} for message in messages]
+            )
+        return {"session_id": session_id, "claim": claim, "messages": messages, "state": session["state"]}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.service = await asyncio.to_thread(SupportService)
+    try:
+        yield
+    finally:
+        await app.state.service.aclose()
+
+
+app = FastAPI(title="Swiggy Support API", lifespan=lifespan)
+
+
+def sse(event):
+    return f"data: {json.dumps(event, default=str)}\n\n"
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(tracer.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/v1/turn")
+async def turn(request: TurnRequest):
+    result = {}
+
+    async def collect(event):
+        if event["event"] == "route":
+            result.update(type=event["type"], route=event["route"])
+        elif event["event"] == "done":
+            result.update(session_id=event["session_id"], reply=event["reply"], state=event["state"])
+        elif event["event"] == "error":
+            result.update(session_id=event["session_id"], error=event["error"])
+
+    await app.state.service.serve_turn(request, collect)
+    if "error" in result:
+        return JSONResponse(result, status_code=500)
+    return result
+
+
+@app.post("/v1/turn/stream")
+async def turn_stream(request: TurnRequest):
+    # The turn runs in its own task and hands events over a queue, so a client
+    # disconnect only cancels that task and the turn still closes in its own context
+    queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            await app.state.service.serve_turn(request, queue.put)
+        finally:
+            queue.put_nowait(None)
+
+    async def events():
+        producer = asyncio.create_task(produce())
+        try:
+            while (event := await queue.get()) is not None:
+                yield sse(event)
+        finally:
+            producer.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.websocket("/v1/ws")
+async def turn_socket(websocket: WebSocket):
+    """One connection per session, one turn per {"message": ...} sent"""
+    await websocket.accept()
+    session_id = websocket.query_params.get("session_id") or str(uuid.uuid4())
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            try:
+                request = TurnRequest(session_id=session_id, message=payload.get("message", ""))
+            except ValueError as e:
+                await websocket.send_json({"event": "error", "error": str(e)})
+                continue
+
+            await app.state.service.serve_turn(request, websocket.send_json)
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/v1/sessions/{session_id}/history")
+async def history(session_id: str, before: Optional[str] = None, limit: int = Query(20, ge=1, le=100)):
+    """Keyset-paginated conversation log, newest page first (pass next_before back as before)"""
+    try:
+        return await asyncio.to_thread(app.state.service.db_manager.get_history, session_id, before, limit)
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+
+
+@app.post("/v1/sessions/{session_id}/photos")
+async def upload_photos(session_id: str, files: List[UploadFile] = File(...)):
+    uploads = []
+    errors = []
+    for upload in files:
+        upload.file.seek(0, os.SEEK_END)
+        size = upload.file.tell()
+        upload.file.seek(0)
+        photo = _Upload(upload, size)
+        validation = app.state.service.photo_tools.validate_photo_upload(photo)
+        errors += [f"{photo.name}: {error}" for error in validation["errors"]]
+        uploads.append(photo)
+
+    if errors:
+        return JSONResponse({"errors": errors}, status_code=422)
+
+    return await app.state.service.process_photos(session_id, uploads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("SUPPORT_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SUPPORT_API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SUPPORT_API_WORKERS", "1")),
+                        help="worker processes; each loads its own agents and policy index")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run("app.api.server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,104 @@
-import sqlite3
 import uuid
 from datetime import datetime
-import random
+from app.database.connection import DEFAULT_DB_PATH, get_pool
+from app.database.write_behind import get_writer
+from app.database.order_repository import get_order_repository, synthetic_order
+from app.tools.tracing import tracer
 
 class DatabaseManager:
-    def __init__(self, db_path="support_bot.db"):
+    def __init__(self, db_path=DEFAULT_DB_PATH):
         self.db_path = db_path
+        self.pool = get_pool(db_path)
+        self.writer = get_writer(db_path)
+        self.orders = get_order_repository(db_path)
     
     def get_order_by_id(self, order_id):
         """Get order details with RAG + RAT context"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return self.orders.get_order(order_id)
+    
+    def get_orders_by_ids(self, order_ids):
+        """{order_id: order} for many orders in one batched lookup"""
+        return self.orders.get_orders(order_ids)
+    
+    def generate_random_order_data(self, order_id):
+        """Generate realistic order data, the same for a given order ID every time"""
+        return synthetic_order(order_id)
+    
+    def save_conversation_with_rag_rat(self, message, sender_type, language, rag_rat_context,
+                                       session_id=None, ticket_id=None, order_id=None):
+        """Save conversation with RAG + RAT context (queued on the write-behind writer)"""
+        conversation_id = str(uuid.uuid4())
+        # Stamp at submit time: rows are committed later, in batches
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
         
         try:
-            cursor.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,))
-            order = cursor.fetchone()
-            conn.close()
+            with tracer.span("db.save_conversation"):
+                self.writer.submit("""
+                    INSERT INTO conversations (conversation_id, message, sender, timestamp, language, rag_rat_context,
+                                               session_id, ticket_id, order_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (conversation_id, message, sender_type, timestamp, language, str(rag_rat_context),
+                      session_id, ticket_id, order_id))
             
-            if order:
-                return {
-                    "order_id": order[0],
-                    "product_name": order,
-                    "amount": order,
-                    "status": order,
-                    "payment_method": order,
-                    "delivery_date": order,
-                    "user_location": order
-                }
-            else:
-                return self.generate_random_order_data(order_id)
-                
         except Exception as e:
-            conn.close()
-            print(f"Database error: {str(e)}")
-            return self.generate_random_order_data(order_id)
+            print(f"Error saving conversation: {str(e)}")
     
-    def generate_random_order_data(self, order_id):
-        """Generate realistic random order data"""
-        products = [
-            "iPhone 14 Mobile Cover", "Samsung Galaxy Cover", "OnePlus Case Black",
-            "Mobile Screen Protector", "Phone Charger Cable", "Bluetooth Earphones",
-            "Power Bank 10000mAh", "Phone Stand", "Car Phone Holder"
-        ]
+    def get_history(self, session_id, before=None, limit=20):
+        """One page of a session's messages, newest page first, messages oldest-first
         
-        return {
-            "order_id": order_id,
-            "product_name": random.choice(products),
-            "amount": random.randint(99, 899),
-            "status": random.choice(["delivered", "in_transit", "processing"]),
-            "payment_method": random.choice(["UPI", "Card", "COD", "Wallet"]),
-            "delivery_date": "2025-08-" + str(random.randint(15, 25)),
-            "user_location": random.choice(["Mumbai", "Delhi", "Bangalore"]),
-            "created_at": f"2025-08-{random.randint(10, 20)}"
-        }
-    
-    def save_conversation_with_rag_rat(self, message, sender_type, language, rag_rat_context):
-        """Save conversation with RAG + RAT context"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        Keyset pagination on (timestamp, rowid): SQLite range-searches
+        idx_conversations_session_ts on (session_id=? AND timestamp<?) and walks it
+        in order, so there is no sort and each page reads limit + 1 rows from the
+        table however long it gets. Pass the returned next_before back as `before`
+        to fetch the previous page; a malformed cursor raises ValueError.
+        """
+        if self.writer.pending():
+            self.writer.flush()
         
-        conversation_id = str(uuid.uuid4())
+        params = [session_id]
+        keyset = ""
+        if before:
+            keyset = "AND (timestamp, rowid) < (?, ?)"
+            params += self._parse_history_cursor(before)
+        params.append(limit + 1)
         
         try:
-            cursor.execute("""
-                INSERT INTO conversations (conversation_id, message, sender, language, rag_rat_context)
-                VALUES (?, ?, ?, ?, ?)
-            """, (conversation_id, message, sender_type, language, str(rag_rat_context)))
-            
-            conn.commit()
-            conn.close()
-            
+            with self.pool.connection() as conn:
+                rows = conn.execute(f"""
+                    SELECT rowid, conversation_id, message, sender, timestamp, language, ticket_id, order_id
+                    FROM conversations
+                    WHERE session_id = ? {keyset}
+                    ORDER BY timestamp DESC, rowid DESC
+                    LIMIT ?
+                """, params).fetchall()
         except Exception as e:
-            conn.close()
-            print(f"Error saving conversation: {str(e)}")
+            print(f"Error loading history: {str(e)}")
+            return {"messages": [], "next_before": None, "has_more": False}
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        messages = [
+            {
+                "conversation_id": row[1],
+                "message": row[2],
+                "sender": row[3],
+                "timestamp": row[4],
+                "language": row[5],
+                "ticket_id": row[6],
+                "order_id": row[7]
+            }
+            for row in reversed(rows)
+        ]
+        
+        return {
+            "messages": messages,
+            "next_before": f"{rows[-1][4]}|{rows[-1][0]}" if has_more else None,
+            "has_more": has_more
+        }
+    
+    def _parse_history_cursor(self, before):
+        """[timestamp, rowid] from a next_before cursor"""
+        before_timestamp, _, before_rowid = before.rpartition("|")
+        if not before_timestamp or not before_rowid.isdigit():
+            raise ValueError(f"Invalid history cursor: {before!r}")
+        return [before_timestamp, int(before_rowid)]
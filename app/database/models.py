@@ -1,13 +1,18 @@
-import sqlite3
+from app.database.connection import DEFAULT_DB_PATH, get_pool
 
 class DatabaseModels:
-    def __init__(self, db_path="support_bot.db"):
+    def __init__(self, db_path=DEFAULT_DB_PATH):
         self.db_path = db_path
+        self.pool = get_pool(db_path)
         self.init_database()
     
     def init_database(self):
         """Initialize database with RAG + RAT support"""
-        conn = sqlite3.connect(self.db_path)
+        with self.pool.transaction() as conn:
+            self._create_tables(conn)
+        print("Database initialized")
+    
+    def _create_tables(self, conn):
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -29,10 +34,54 @@ class DatabaseModels:
                 sender TEXT,
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                 language TEXT,
-                rag_rat_context TEXT
+                rag_rat_context TEXT,
+                session_id TEXT,
+                ticket_id TEXT,
+                order_id TEXT
             )
         """)
         
-        conn.commit()
-        conn.close()
-        print("Database initialized")
+        # Databases created before these columns existed
+        self._add_missing_columns(cursor, "conversations", {
+            "session_id": "TEXT",
+            "ticket_id": "TEXT",
+            "order_id": "TEXT"
+        })
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_conversations_session_ts
+            ON conversations (session_id, timestamp)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_conversations_ticket_ts
+            ON conversations (ticket_id, timestamp)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_conversations_order
+            ON conversations (order_id)
+        """)
+        
+        # One row per handled turn; spans holds the JSON span tree
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS turn_traces (
+                trace_id TEXT PRIMARY KEY,
+                session_id TEXT,
+                started_at REAL,
+                duration_ms REAL,
+                route TEXT,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                error TEXT,
+                spans TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_turn_traces_session
+            ON turn_traces (session_id, started_at)
+        """)
+    
+    def _add_missing_columns(self, cursor, table, columns):
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
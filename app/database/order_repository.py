@@ -0,0 +1,131 @@
+import os
+import random
+import threading
+from app.database.connection import DEFAULT_DB_PATH, get_pool
+from app.tools.cache import LRUTTLCache
+from app.tools.tracing import tracer
+
+ORDER_COLUMNS = ("order_id", "product_name", "amount", "status", "payment_method", "delivery_date", "user_location")
+
+# Well under SQLite's default limit of 999 bound parameters per statement
+IN_QUERY_CHUNK = 500
+
+SYNTHETIC_PRODUCTS = [
+    "iPhone 14 Mobile Cover", "Samsung Galaxy Cover", "OnePlus Case Black",
+    "Mobile Screen Protector", "Phone Charger Cable", "Bluetooth Earphones",
+    "Power Bank 10000mAh", "Phone Stand", "Car Phone Holder"
+]
+
+
+def synthetic_order(order_id):
+    """Prototype order data for IDs not in the orders table, the same for a given ID every time
+
+    Seeded from the order ID (str seeds hash with SHA-512, not the per-process
+    hash salt), so every rerun and every worker fabricates the same order.
+    """
+    rng = random.Random(f"order:{order_id}")
+    return {
+        "order_id": order_id,
+        "product_name": rng.choice(SYNTHETIC_PRODUCTS),
+        "amount": rng.randint(99, 899),
+        "status": rng.choice(["delivered", "in_transit", "processing"]),
+        "payment_method": rng.choice(["UPI", "Card", "COD", "Wallet"]),
+        "delivery_date": "2025-08-" + str(rng.randint(15, 25)),
+        "user_location": rng.choice(["Mumbai", "Delhi", "Bangalore"]),
+        "created_at": f"2025-08-{rng.randint(10, 20)}"
+    }
+
+
+class OrderRepository:
+    """Order lookups behind a bounded LRU cache, batched into IN queries
+
+    Misses are read in one query per IN_QUERY_CHUNK IDs. IDs the orders table
+    does not have get synthetic_order data, which is cached like a real row
+    because it is deterministic. If the query itself fails the requested
+    orders are synthesized for this call only. Lookups are counted in
+    support_order_lookups_total by result (cache, db, synthetic, error).
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, cache_size=None, cache_ttl=None):
+        self.pool = get_pool(db_path)
+        self.cache = LRUTTLCache(
+            max_size=cache_size if cache_size is not None else int(os.getenv("ORDER_CACHE_SIZE", "4096")),
+            ttl=cache_ttl if cache_ttl is not None else float(os.getenv("ORDER_CACHE_TTL", "300"))
+        )
+
+    def get_order(self, order_id):
+        return self.get_orders([order_id])[str(order_id)]
+
+    def get_orders(self, order_ids):
+        """{order_id: order} for every requested ID; orders are fresh dicts the caller may modify"""
+        order_ids = [str(order_id) for order_id in dict.fromkeys(order_ids)]
+        orders = {}
+        missing = []
+        for order_id in order_ids:
+            order = self.cache.get(order_id)
+            if order is None:
+                missing.append(order_id)
+            else:
+                orders[order_id] = dict(order)
+        self._count("cache", len(orders))
+
+        if missing:
+            try:
+                found = self._fetch(missing)
+            except Exception as e:
+                # Still answer the turn, but a failed lookup is not a real miss: nothing is
+                # cached, so the next lookup reads the table again instead of serving invented data
+                print(f"Database error: {str(e)}")
+                self._count("error", len(missing))
+                for order_id in missing:
+                    orders[order_id] = synthetic_order(order_id)
+                return orders
+
+            self._count("db", len(found))
+            for order_id in missing:
+                order = found.get(order_id)
+                if order is None:
+                    order = synthetic_order(order_id)
+                    self._count("synthetic")
+                self.cache.set(order_id, order)
+                orders[order_id] = dict(order)
+
+        return orders
+
+    def invalidate(self, order_id=None):
+        """Drop one cached order (after it changes in the table), or all of them"""
+        self.cache.invalidate(order_id)
+
+    def _fetch(self, order_ids):
+        found = {}
+        with tracer.span("orders.fetch", ids=len(order_ids)), self.pool.connection() as conn:
+            for start in range(0, len(order_ids), IN_QUERY_CHUNK):
+                chunk = order_ids[start:start + IN_QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(f"""
+                    SELECT {", ".join(ORDER_COLUMNS)}
+                    FROM orders WHERE order_id IN ({placeholders})
+                """, chunk).fetchall()
+                for row in rows:
+                    found[row[0]] = dict(zip(ORDER_COLUMNS, row))
+        return found
+
+    def _count(self, result, amount=1):
+        if amount:
+            tracer.registry.inc("support_order_lookups_total", amount, "Order lookups by where they were answered",
+                                result=result)
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_order_repository(db_path=DEFAULT_DB_PATH):
+    """Process-wide repository per database file, so every caller shares one order cache"""
+    pool = get_pool(db_path)
+    with _repositories_lock:
+        repository = _repositories.get(id(pool))
+        if repository is None:
+            repository = OrderRepository(db_path)
+            _repositories[id(pool)] = repository
+        return repository
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import sqlite3
+from app.database.connection import DEFAULT_DB_PATH, get_pool
+from app.tools.cache import LRUTTLCache
+from app.tools.tracing import tracer
+
+SESSION_STATE_DEFAULTS = {
+    "current_order": None,
+    "issue_type": None,
+    "current_ticket": None,
+    "awaiting_photo": False,
+    "photo_received": False
+}
+
+# Recent messages kept on the session for prompting; the full log is the conversations table
+SESSION_MESSAGE_LIMIT = 40
+
+
+def new_memory():
+    """Rolling summary of messages with seq <= through; count is the last seq handed out"""
+    return {"summary": "", "through": 0, "count": 0}
+
+
+class SessionConflictError(Exception):
+    """Another worker saved the session since it was loaded"""
+
+
+def new_session(session_id):
+    return {"session_id": session_id, "version": 0, "state": dict(SESSION_STATE_DEFAULTS), "messages": [],
+            "memory": new_memory()}
+
+
+class SessionStore:
+    """Per-session conversation state with optimistic versioning
+
+    A session is {"session_id", "version", "state", "messages", "memory"}. save() only
+    succeeds if the stored version still matches the loaded one, and bumps it.
+    Backends implement _read and _write; update() handles the conflict retries.
+    """
+
+    def __init__(self, message_limit=SESSION_MESSAGE_LIMIT):
+        self.message_limit = message_limit
+
+    def load(self, session_id, validate=True):
+        """Latest saved session, or a fresh version-0 one
+
+        validate=False lets a backend serve its cached copy without checking it
+        is still current, for repeat reads within a turn that already loaded it.
+        """
+        record = self._read(session_id, validate)
+        if record is None:
+            return new_session(session_id)
+        version, state, messages, memory = record
+        return {
+            "session_id": session_id,
+            "version": version,
+            "state": {**SESSION_STATE_DEFAULTS, **state},
+            "messages": messages,
+            "memory": {**new_memory(), **memory}
+        }
+
+    def save(self, session):
+        """Write the session if nobody else has; returns the new version or raises SessionConflictError"""
+        session["messages"] = session["messages"][-self.message_limit:]
+        new_version = self._write(session["session_id"], session["version"], session["state"],
+                                  session["messages"], session["memory"])
+        session["version"] = new_version
+        return new_version
+
+    def update(self, session_id, apply_changes, session=None, retries=3):
+        """Apply a turn's changes and save, re-applying them on the latest version after a conflict
+
+        apply_changes(session) mutates the session in place and must be safe to
+        call again on a newer copy. Pass the session the turn started from to
+        skip the first read.
+        """
+        session = session or self.load(session_id)
+        for attempt in range(retries + 1):
+            apply_changes(session)
+            try:
+                self.save(session)
+                return session
+            except SessionConflictError:
+                tracer.registry.inc("support_session_conflicts_total", 1, "Session saves retried after a version conflict")
+                if attempt == retries:
+                    raise
+                # The conflict dropped any cached copy, so this reads the stored row
+                session = self.load(session_id, validate=False)
+
+    def _read(self, session_id, validate=True):
+        """(version, state, messages, memory) or None"""
+        raise NotImplementedError
+
+    def _write(self, session_id, expected_version, state, messages, memory):
+        """Compare-and-swap on version; returns the new version"""
+        raise NotImplementedError
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions table in the app database behind an in-process LRU read-through cache
+
+    Every worker process can serve any session: a validated load checks the
+    cached copy's version against the table before using it, so a turn never
+    starts from state another worker has replaced. A save that still races
+    another worker fails the version check, the entry is dropped, and
+    update() retries on the row read back from SQLite.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, cache_size=None, cache_ttl=None,
+                 message_limit=SESSION_MESSAGE_LIMIT):
+        super().__init__(message_limit)
+        self.pool = get_pool(db_path)
+        self.cache = LRUTTLCache(
+            max_size=cache_size if cache_size is not None else int(os.getenv("SESSION_CACHE_SIZE", "1024")),
+            ttl=cache_ttl if cache_ttl is not None else float(os.getenv("SESSION_CACHE_TTL", "60"))
+        )
+        self.init_table()
+
+    def init_table(self):
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    messages TEXT NOT NULL,
+                    memory TEXT NOT NULL DEFAULT '{}',
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "memory" not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN memory TEXT NOT NULL DEFAULT '{}'")
+
+    def _read(self, session_id, validate=True):
+        # Rows are cached serialized, so callers can mutate what load() returns
+        row = self.cache.get(session_id)
+        if row is not None and validate and self._stored_version(session_id) != row[0]:
+            tracer.registry.inc("support_session_stale_reads_total", 1,
+                                "Cached sessions replaced by another worker before a load")
+            self.cache.invalidate(session_id)
+            row = None
+        if row is None:
+            with tracer.span("session.load"):
+                with self.pool.connection() as conn:
+                    row = conn.execute("""
+                        SELECT version, state, messages, memory FROM sessions WHERE session_id = ?
+                    """, (session_id,)).fetchone()
+            if row is None:
+                return None
+            self.cache.set(session_id, row)
+        return row[0], json.loads(row[1]), json.loads(row[2]), json.loads(row[3])
+
+    def _stored_version(self, session_id):
+        with tracer.span("session.version"):
+            with self.pool.connection() as conn:
+                row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def _write(self, session_id, expected_version, state, messages, memory):
+        new_version = expected_version + 1
+        state_json = json.dumps(state, default=str)
+        messages_json = json.dumps(messages, default=str)
+        memory_json = json.dumps(memory)
+
+        with tracer.span("session.save", version=new_version):
+            try:
+                with self.pool.transaction() as conn:
+                    if expected_version == 0:
+                        try:
+                            conn.execute("""
+                                INSERT INTO sessions (session_id, version, state, messages, memory, updated_at)
+                                VALUES (?, ?, ?, ?, ?, ?)
+                            """, (session_id, new_version, state_json, messages_json, memory_json, time.time()))
+                        except sqlite3.IntegrityError as e:
+                            raise SessionConflictError(f"Session {session_id} was created concurrently") from e
+                    else:
+                        updated = conn.execute("""
+                            UPDATE sessions SET version = ?, state = ?, messages = ?, memory = ?, updated_at = ?
+                            WHERE session_id = ? AND version = ?
+                        """, (new_version, state_json, messages_json, memory_json, time.time(),
+                              session_id, expected_version)).rowcount
+                        if not updated:
+                            raise SessionConflictError(f"Session {session_id} changed since version {expected_version}")
+            except SessionConflictError:
+                self.cache.invalidate(session_id)
+                raise
+
+        self.cache.set(session_id, (new_version, state_json, messages_json, memory_json))
+        return new_version
@@ -0,0 +1,181 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from app.database.connection import DEFAULT_DB_PATH, get_pool
+from app.tools.tracing import tracer
+
+# "async": rows are queued and group-committed by a background thread
+# "sync": rows are committed on the caller's thread before returning
+DURABILITY_MODES = ("async", "sync")
+
+
+class _FlushMarker:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """Background group-commit writer for log-style INSERTs
+
+    Rows are buffered in a bounded queue and written with executemany in one
+    transaction once batch_size rows are waiting or flush_interval has passed.
+    When the queue is full, submit() blocks for up to put_timeout (backpressure)
+    and then drops the row rather than stalling the request path indefinitely.
+    """
+
+    def __init__(self, pool, batch_size=200, flush_interval=0.25, max_queue=10000,
+                 put_timeout=0.5, durability=None):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.durability = durability or os.getenv("DB_WRITE_MODE", "async")
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {self.durability}")
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "dropped": 0, "errors": 0}
+        self._pending = 0
+        self._closed = False
+        self._thread = None
+        if self.durability == "async":
+            self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def submit(self, sql, params):
+        """Queue one row for writing; returns False if it had to be dropped"""
+        if self.durability == "sync" or self._closed:
+            self._write([(sql, params)])
+            return True
+        with self._stats_lock:
+            self._pending += 1
+        try:
+            self._queue.put((sql, params), timeout=self.put_timeout)
+        except queue.Full:
+            self._settle(1)
+            self._count("dropped")
+            print("Write-behind queue full, dropping row")
+            return False
+        self._count("enqueued")
+        return True
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far is committed"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self):
+        """Flush remaining rows and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def pending(self):
+        """Rows submitted but not yet committed, including the batch being written"""
+        with self._stats_lock:
+            return self._pending
+
+    def _run(self):
+        while True:
+            batch = []
+            markers = []
+            stop = False
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, _FlushMarker):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+
+                if stop or markers or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+                self._settle(len(batch))
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                # Drain anything that raced in behind the stop sentinel
+                leftovers = []
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, _FlushMarker):
+                        item.done.set()
+                    elif item is not _STOP:
+                        leftovers.append(item)
+                if leftovers:
+                    self._write(leftovers)
+                    self._settle(len(leftovers))
+                return
+
+    def _settle(self, count):
+        with self._stats_lock:
+            self._pending -= count
+
+    def _write(self, rows):
+        """One transaction; consecutive rows with the same SQL go through executemany"""
+        groups = []
+        for sql, params in rows:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        try:
+            with tracer.span("db.write_batch", rows=len(rows)), self.pool.transaction() as conn:
+                for sql, params_list in groups:
+                    conn.executemany(sql, params_list)
+            self._count("written", len(rows))
+            self._count("batches")
+            tracer.registry.inc("support_db_rows_written_total", len(rows), "Rows committed by the write-behind writer")
+        except Exception as e:
+            self._count("errors", len(rows))
+            print(f"Write-behind batch failed ({len(rows)} rows): {str(e)}")
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path=DEFAULT_DB_PATH):
+    """Process-wide writer per database file, shared like the connection pool"""
+    pool = get_pool(db_path)
+    with _writers_lock:
+        writer = _writers.get(id(pool))
+        if writer is None:
+            writer = WriteBehindWriter(pool)
+            _writers[id(pool)] = writer
+        return writer
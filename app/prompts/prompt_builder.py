@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import textwrap
+
+TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+REPLY_INSTRUCTIONS = """You are a Swiggy Support Agent. Think naturally about this situation:
+
+RESPONSE RULES:
+- Maximum 1-2 sentences only
+- Use same language as user (Hindi for Hindi, English for English)
+- Think what a real support person would say
+- Don't use templates, think naturally
+- If RAG + RAT policy reasoning is provided, use it to inform your response
+
+SPECIFIC GUIDANCE:
+- For inappropriate questions: Politely redirect to support topics in user's language
+- For price questions: Share the price info naturally and ask if they want to order
+- For support questions with policy reasoning: Use the RAG + RAT recommendation
+- If you need order ID to help, ask for it first - don't claim to check without it
+
+Think and respond naturally in 1-2 sentences based on the context."""
+
+ORDER_FIELDS = ("order_id", "product_name", "amount", "status", "payment_method", "delivery_date")
+MINIMAL_ORDER_FIELDS = ("order_id", "product_name", "amount", "status")
+
+# Most unsummarized messages a prompt shows verbatim; older ones reach it through the rolling summary
+RECENT_WINDOW_MESSAGES = 8
+
+# Progressively more aggressive settings, tried in order until the prompt fits
+COMPACTION_LEVELS = [
+    {"history_messages": RECENT_WINDOW_MESSAGES, "history_chars": 160, "summary_chars": 400,
+     "reasoning_chars": 400, "order_fields": ORDER_FIELDS},
+    {"history_messages": 4, "history_chars": 100, "summary_chars": 240,
+     "reasoning_chars": 160, "order_fields": ORDER_FIELDS},
+    {"history_messages": 0, "history_chars": 0, "summary_chars": 160,
+     "reasoning_chars": 80, "order_fields": ORDER_FIELDS},
+    {"history_messages": 0, "history_chars": 0, "summary_chars": 0,
+     "reasoning_chars": 0, "order_fields": MINIMAL_ORDER_FIELDS},
+]
+
+
+def estimate_tokens(text):
+    """Approximate Llama token count: one per word or symbol, plus one per 6 extra characters of long words"""
+    return sum(1 + len(piece) // 6 for piece in TOKEN_PIECES.findall(text))
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def clip_text(text, limit):
+    """Shorten to at most limit chars, preferring a sentence end, then a word boundary"""
+    text = " ".join(str(text).split())
+    if len(text) <= limit:
+        return text
+    if limit <= 0:
+        return ""
+    cut = text[:limit]
+    sentence_end = max(cut.rfind(". "), cut.rfind("? "), cut.rfind("! "))
+    if sentence_end > limit // 2:
+        return cut[:sentence_end + 1]
+    return cut.rsplit(" ", 1)[0] + "…"
+
+
+class ReplyPromptBuilder:
+    """Builds the support-reply prompt within an input-token budget
+
+    Thinking prose, retrieved policy text, indentation and order fields already
+    shown elsewhere are left out; history, summary and reasoning are clipped
+    further until the prompt fits max_input_tokens. Long conversations cost the
+    same as short ones: only the rolling summary and the recent window are sent.
+    """
+
+    def __init__(self, max_input_tokens=None):
+        self.max_input_tokens = max_input_tokens or int(os.getenv("PROMPT_INPUT_BUDGET", "600"))
+        self.instruction_tokens = estimate_tokens(REPLY_INSTRUCTIONS)
+
+    def build(self, user_query, query_type, conversation_history, session_state,
+              policy_decision=None, extra_context="", summary=""):
+        """Return (prompt, stats) where stats reports estimated tokens and savings vs the uncompacted prompt"""
+        history = list(conversation_history or [])
+        if history and history[-1].get("content") == user_query:
+            # The current message is already the USER_QUERY line
+            history = history[:-1]
+
+        for level, settings in enumerate(COMPACTION_LEVELS):
+            prompt = self._render(user_query, query_type, history, session_state,
+                                  policy_decision, extra_context, summary, settings)
+            input_tokens = estimate_tokens(prompt)
+            if input_tokens <= self.max_input_tokens:
+                break
+
+        baseline_tokens = estimate_tokens(self._uncompacted_prompt(
+            user_query, query_type, conversation_history, session_state, policy_decision, extra_context
+        ))
+
+        return prompt, {
+            "input_tokens": input_tokens,
+            "baseline_tokens": baseline_tokens,
+            "saved_tokens": baseline_tokens - input_tokens,
+            "budget": self.max_input_tokens,
+            "compaction_level": level,
+            "over_budget": input_tokens > self.max_input_tokens
+        }
+
+    def _render(self, user_query, query_type, history, session_state, policy_decision, extra_context, summary, settings):
+        lines = [f'USER_QUERY: "{user_query}"', f"QUERY_TYPE: {query_type}"]
+
+        summary = clip_text(summary or "", settings["summary_chars"])
+        if summary:
+            lines.append(f"EARLIER_CONVERSATION: {summary}")
+
+        if settings["history_messages"] and history:
+            recent = [
+                {"role": message.get("role"), "content": clip_text(message.get("content", ""), settings["history_chars"])}
+                for message in history[-settings["history_messages"]:]
+            ]
+            lines.append(f"HISTORY: {compact_json(recent)}")
+
+        session = {
+            "issue_type": session_state.get("issue_type"),
+            "ticket": session_state.get("current_ticket")
+        }
+        session = {key: value for key, value in session.items() if value}
+        if session:
+            lines.append(f"SESSION: {compact_json(session)}")
+
+        order = session_state.get("current_order")
+        if order:
+            lines.append(f"ORDER: {compact_json({k: order[k] for k in settings['order_fields'] if k in order})}")
+
+        if policy_decision:
+            decision = {
+                "recommendation": policy_decision.get("recommendation"),
+                "confidence": policy_decision.get("confidence")
+            }
+            reasoning = clip_text(policy_decision.get("reasoning", ""), settings["reasoning_chars"])
+            if reasoning:
+                decision["reasoning"] = reasoning
+            policy_types = sorted({p["policy_type"] for p in policy_decision.get("retrieved_policies", [])})
+            if policy_types:
+                decision["policies"] = policy_types
+            lines.append(f"RAG_RAT_POLICY_DECISION: {compact_json(decision)}")
+
+        if extra_context:
+            lines.append(extra_context)
+
+        return "\n".join(lines) + "\n\n" + REPLY_INSTRUCTIONS
+
+    def _uncompacted_prompt(self, user_query, query_type, conversation_history, session_state,
+                            policy_decision, extra_context):
+        """The prompt as it was built before compaction, used only to measure savings"""
+        history = conversation_history[-2:] if len(conversation_history) >= 2 else conversation_history
+        context = f"""
+        USER_QUERY: "{user_query}"
+        QUERY_TYPE: {query_type}
+        CONVERSATION_HISTORY: {history}
+        SESSION_STATE: {session_state}
+        """
+        if policy_decision:
+            context += f"\nRAG_RAT_POLICY_REASONING: {json.dumps(policy_decision, indent=2)}"
+        if extra_context:
+            context += f"\n{extra_context}"
+        return f"""
+        {context}
+
+{textwrap.indent(REPLY_INSTRUCTIONS, "        ")}
+        """
@@ -1,64 +1,135 @@
-import sqlite3
 import uuid
 import os
+import json
+import hashlib
+import tempfile
 from datetime import datetime
+from app.database.connection import DEFAULT_DB_PATH, get_pool
+from app.database.write_behind import get_writer
+
+UPLOAD_DIR = "app/uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 class DatabaseTools:
-    def __init__(self):
-        self.db_path = "support_bot.db"
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.pool = get_pool(db_path)
+        self.writer = get_writer(db_path)
         self.init_tables()
     
     def init_tables(self):
         """Initialize required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Photos table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS support_photos (
-                photo_id TEXT PRIMARY KEY,
-                ticket_id TEXT,
-                file_path TEXT,
-                original_filename TEXT,
-                upload_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                analysis_result TEXT
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with self.pool.transaction() as conn:
+            # Photos table
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS support_photos (
+                    photo_id TEXT PRIMARY KEY,
+                    ticket_id TEXT,
+                    file_path TEXT,
+                    original_filename TEXT,
+                    upload_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    analysis_result TEXT,
+                    content_hash TEXT
+                )
+            """)
+            
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(support_photos)")}
+            if "content_hash" not in columns:
+                conn.execute("ALTER TABLE support_photos ADD COLUMN content_hash TEXT")
+            
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_support_photos_hash
+                ON support_photos (content_hash)
+            """)
     
     def save_uploaded_photo(self, uploaded_file, ticket_id):
-        """Save uploaded photo"""
+        """Save uploaded photo under its SHA-256, reusing the stored copy for re-uploads
+        
+        The upload is streamed to a temp file in chunks while hashing, then moved
+        to app/uploads/<h[:2]>/<h[2:4]>/<hash>.<ext>. If the same bytes were
+        uploaded before, the existing photo_id and any cached analysis_result
+        are returned instead of storing and analyzing the photo again.
+        """
+        tmp_path = None
         try:
-            upload_dir = "app/uploads"
-            os.makedirs(upload_dir, exist_ok=True)
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            file_extension = uploaded_file.name.split('.')[-1].lower()
             
-            photo_id = str(uuid.uuid4())
-            file_extension = uploaded_file.name.split('.')[-1]
-            file_path = os.path.join(upload_dir, f"{photo_id}.{file_extension}")
+            digest = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                uploaded_file.seek(0)
+                for chunk in iter(lambda: uploaded_file.read(UPLOAD_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+            content_hash = digest.hexdigest()
             
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getvalue())
+            existing = self.find_photo_by_hash(content_hash)
+            if existing and os.path.exists(existing["file_path"]):
+                os.remove(tmp_path)
+                return {
+                    "success": True,
+                    "photo_id": existing["photo_id"],
+                    "file_path": existing["file_path"],
+                    "content_hash": content_hash,
+                    "duplicate": True,
+                    "analysis_result": existing["analysis_result"]
+                }
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            shard_dir = os.path.join(UPLOAD_DIR, content_hash[:2], content_hash[2:4])
+            os.makedirs(shard_dir, exist_ok=True)
+            file_path = os.path.join(shard_dir, f"{content_hash}.{file_extension}")
+            os.replace(tmp_path, file_path)
+            tmp_path = None
             
-            cursor.execute("""
-                INSERT INTO support_photos (photo_id, ticket_id, file_path, original_filename)
-                VALUES (?, ?, ?, ?)
-            """, (photo_id, ticket_id, file_path, uploaded_file.name))
-            
-            conn.commit()
-            conn.close()
+            # Committed before returning, unlike the write-behind rows: the analysis
+            # update and later duplicate checks need this row to exist
+            photo_id = str(uuid.uuid4())
+            with self.pool.transaction() as conn:
+                conn.execute("""
+                    INSERT INTO support_photos (photo_id, ticket_id, file_path, original_filename, upload_timestamp, content_hash)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (photo_id, ticket_id, file_path, uploaded_file.name,
+                      datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"), content_hash))
             
             return {
                 "success": True,
                 "photo_id": photo_id,
-                "file_path": file_path
+                "file_path": file_path,
+                "content_hash": content_hash,
+                "duplicate": False,
+                "analysis_result": None
             }
             
         except Exception as e:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
             return {"success": False, "error": str(e)}
+    
+    def find_photo_by_hash(self, content_hash):
+        """Look up a stored photo by content hash; analysis_result is decoded if present"""
+        if self.writer.pending():
+            self.writer.flush()
         
-        return request_id
+        with self.pool.connection() as conn:
+            row = conn.execute("""
+                SELECT photo_id, file_path, analysis_result FROM support_photos
+                WHERE content_hash = ?
+                ORDER BY upload_timestamp
+                LIMIT 1
+            """, (content_hash,)).fetchone()
+        
+        if not row:
+            return None
+        
+        return {
+            "photo_id": row[0],
+            "file_path": row[1],
+            "analysis_result": json.loads(row[2]) if row[2] else None
+        }
+    
+    def save_photo_analysis(self, photo_id, analysis):
+        """Store the analysis so re-uploads of the same photo can reuse it"""
+        self.writer.submit("""
+            UPDATE support_photos SET analysis_result = ? WHERE photo_id = ?
+        """, (json.dumps(analysis), photo_id))
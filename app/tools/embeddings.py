@@ -0,0 +1,140 @@
+import os
+import hashlib
+import re
+import tempfile
+import numpy as np
+
+EMBEDDING_DIR = "app/index"
+
+
+class HashingEmbedder:
+    """Deterministic local embedder: signed feature hashing of words and word bigrams"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f"hashing{dim}"
+
+    def _features(self, text):
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        """Embed texts into an L2-normalized float32 matrix"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                matrix[row, bucket] += sign
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class SentenceTransformerEmbedder:
+    """sentence-transformers model behind the same embed() interface"""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name.replace("/", "_")
+
+    def embed(self, texts):
+        """Embed texts into an L2-normalized float32 matrix"""
+        vectors = self.model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+        return vectors.astype(np.float32, copy=False)
+
+
+def get_embedder(name=None):
+    """Pick an embedder by name: "hashing" (default, offline) or a sentence-transformers model"""
+    name = name or os.getenv("RAG_EMBEDDER", "hashing")
+    if name == "hashing":
+        return HashingEmbedder()
+    return SentenceTransformerEmbedder(name)
+
+
+class EmbeddingIndex:
+    """Policy-section embeddings in one contiguous float32 matrix, memory-mapped from disk"""
+
+    def __init__(self, embedder, texts, index_dir=EMBEDDING_DIR, previous=None):
+        self.embedder = embedder
+        self.texts = list(texts)
+        self.path = self._matrix_path(texts, index_dir)
+        self.matrix = self._open_or_build(self.texts, previous)
+
+    def _matrix_path(self, texts, index_dir):
+        """File name is keyed on embedder and section contents, so edits never reuse stale rows"""
+        digest = hashlib.sha256()
+        for text in texts:
+            digest.update(text.encode("utf-8"))
+            digest.update(b"\0")
+        return os.path.join(index_dir, f"policy_embeddings_{self.embedder.name}_{digest.hexdigest()[:16]}.npy")
+
+    def _open_or_build(self, texts, previous=None):
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            vectors = self._embed_reusing(texts, previous)
+            # A private temp file per builder: workers starting together may all build this matrix
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".npy.tmp")
+            os.close(fd)
+            try:
+                matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=vectors.shape)
+                matrix[:] = vectors
+                matrix.flush()
+                del matrix
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        return np.load(self.path, mmap_mode="r")
+
+    def remove_file(self):
+        """Delete this index's matrix file once a newer generation has replaced it
+
+        Open memory maps stay readable after the unlink, so queries still
+        holding this index finish normally. Another worker may have removed
+        the file already.
+        """
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _embed_reusing(self, texts, previous):
+        """Embed texts, copying rows for any text the previous index already embedded"""
+        vectors = np.zeros((len(texts), self.embedder.dim), dtype=np.float32)
+        known = {}
+        if previous is not None and previous.embedder.name == self.embedder.name:
+            known = {text: row for row, text in enumerate(previous.texts)}
+
+        missing = []
+        for row, text in enumerate(texts):
+            if text in known:
+                vectors[row] = previous.matrix[known[text]]
+            else:
+                missing.append(row)
+        if missing:
+            vectors[missing] = self.embedder.embed([texts[row] for row in missing])
+        return vectors
+
+    def scores(self, query):
+        """Cosine similarity of the query against every row in one matrix-vector product"""
+        query_vector = self.embedder.embed([query])[0]
+        return self.matrix @ query_vector
+
+    def search(self, query, k=3):
+        """Return top-k (row, score) pairs, best first"""
+        return self.top_k(self.scores(query), k)
+
+    @staticmethod
+    def top_k(scores, k):
+        """Select the k best rows with argpartition, then order just those"""
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(row), float(scores[row])) for row in top]
@@ -0,0 +1,133 @@
+import re
+
+# Hinglish spelling variants, applied word by word inside multi-word keywords
+HINGLISH_VARIANTS = {
+    "nahi": ("nahi", "nahin", "nai", "nhi", "nahee"),
+    "mila": ("mila", "mili", "mile", "mela"),
+    "aaya": ("aaya", "aya", "aayi", "aai", "ayi"),
+    "kitna": ("kitna", "kitni"),
+    "kitne": ("kitne", "kitney"),
+    "hai": ("hai", "he", "h"),
+    "kya": ("kya", "kia"),
+    "gaya": ("gaya", "gya", "gayi", "gyi"),
+    "kharab": ("kharab", "khraab", "kharaab"),
+    "galat": ("galat", "glt", "galt"),
+}
+
+# Keyword syntax: keywords match whole words (multi-word keywords match across any
+# whitespace); a trailing "*" on a single word also accepts any suffix ("refund*"
+# matches "refunded")
+SUPPORT_KEYWORDS = {
+    "price": [
+        "price*", "cost*", "rate", "rates", "kitna hai", "how much", "kitne ka",
+        "kitne mein", "price kya hai", "rate kya hai", "cost kitna"
+    ],
+    "inappropriate": [
+        "dating", "relationship*", "girlfriend", "boyfriend", "marriage",
+        "politic*", "religion", "sports", "movie*", "celebrit*",
+        "sex", "sexy", "adult", "xxx", "porn*",
+        "coding", "programming", "software development",
+        "how are you", "what's your name", "whats your name", "what is your name",
+        "where do you live", "tell me joke", "tell me a joke"
+    ],
+    "issue_damage": [
+        "damage*", "broken", "crack*", "kharab", "toot gaya", "tut gaya", "tuta", "tooti", "phat gaya"
+    ],
+    "issue_missing": [
+        "nahi mila", "not received", "nahi aaya", "missing"
+    ],
+    "issue_wrong": [
+        "wrong", "galat", "different", "alag"
+    ],
+    "policy": [
+        "damage*", "broken", "defect*", "crack*", "photo*", "evidence",
+        "missing", "not delivered", "lost", "incomplete",
+        "wrong", "incorrect*", "different", "mismatch*",
+        "refund*", "replacement*", "exchange*", "return*",
+        "24 hours", "48 hours", "7 days", "immediate*"
+    ],
+}
+
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+STEM_PREFIX_LENGTH = 4
+
+
+def canonical_keyword(keyword):
+    return keyword.rstrip("*")
+
+
+class KeywordMatcher:
+    """Every keyword of every category matched in a single pass over the message's word tokens
+
+    Keywords compile into a word-level phrase table (with Hinglish spellings
+    expanded) plus a stem table, so a message is tokenized once and each token
+    costs a few dict lookups no matter how many keywords or categories exist.
+    """
+
+    def __init__(self, categories, variants=None):
+        self.variants = variants or {}
+        self.phrases = {}
+        self.phrase_lengths = {}
+        self.stems = {}
+        self.stem_lengths = set()
+
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                owner = (category, canonical_keyword(keyword))
+                words = canonical_keyword(keyword).lower().split()
+                if keyword.endswith("*"):
+                    if len(words) != 1 or len(words[0]) < STEM_PREFIX_LENGTH:
+                        raise ValueError(f"Stem keywords must be one word of {STEM_PREFIX_LENGTH}+ chars: {keyword}")
+                    self.stems.setdefault(words[0], []).append(owner)
+                    self.stem_lengths.add(len(words[0]))
+                    continue
+                for phrase in self._spellings(words):
+                    self.phrases.setdefault(phrase, []).append(owner)
+                    self.phrase_lengths.setdefault(phrase[0], set()).add(len(phrase))
+
+        # Only tokens sharing a stem's first letters pay for stem lookups
+        self.stem_prefixes = {stem[:STEM_PREFIX_LENGTH] for stem in self.stems}
+        self.stem_lengths = sorted(self.stem_lengths, reverse=True)
+        self.phrase_lengths = {word: sorted(lengths, reverse=True) for word, lengths in self.phrase_lengths.items()}
+
+    def _spellings(self, words):
+        """Every combination of per-word spelling variants"""
+        phrases = [()]
+        for word in words:
+            phrases = [phrase + (spelling,) for phrase in phrases for spelling in self.variants.get(word, (word,))]
+        return phrases
+
+    def match(self, text):
+        """Map each matched category to its canonical keywords, in order of first appearance"""
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        found = {}
+
+        def record(owners):
+            for category, keyword in owners:
+                keywords = found.setdefault(category, [])
+                if keyword not in keywords:
+                    keywords.append(keyword)
+
+        for i, token in enumerate(tokens):
+            lengths = self.phrase_lengths.get(token)
+            if lengths:
+                # Longest phrase starting here wins, as "price kya hai" over "price"
+                for length in lengths:
+                    owners = self.phrases.get(tuple(tokens[i:i + length]))
+                    if owners:
+                        record(owners)
+                        break
+            if token[:STEM_PREFIX_LENGTH] in self.stem_prefixes:
+                for length in self.stem_lengths:
+                    owners = self.stems.get(token[:length]) if len(token) >= length else None
+                    if owners:
+                        record(owners)
+                        break
+        return found
+
+    def matches(self, text, category):
+        return category in self.match(text)
+
+
+SUPPORT_MATCHER = KeywordMatcher(SUPPORT_KEYWORDS, HINGLISH_VARIANTS)
@@ -0,0 +1,89 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+
+SNAPSHOT_PATH = "app/index/policy_index.pkl"
+
+# Bump when section splitting, keyword extraction or PolicyIndex internals change
+SNAPSHOT_VERSION = 2
+
+
+def file_sha256(file_path):
+    try:
+        with open(file_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def build_key(policy_files, parser_fingerprint):
+    """What a snapshot must match to be reused: format version, parser inputs and file list"""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "parser": parser_fingerprint,
+        "files": dict(policy_files)
+    }
+
+
+def fingerprint(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class PolicySnapshot:
+    """Versioned pickle of parsed policy sections and their PolicyIndex
+
+    A snapshot is reused when its key matches and every policy file has the
+    recorded (mtime, size). If only mtimes moved (checkout, copy, touch), the
+    files are re-hashed and the snapshot is still used when the SHA-256s match.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+
+    def load(self, key, signature):
+        """Return (policies, index) or None when missing, stale or unreadable"""
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable policy snapshot: {str(e)}")
+            return None
+
+        if not isinstance(snapshot, dict) or snapshot.get("key") != key:
+            return None
+
+        if snapshot["signature"] != signature:
+            hashes = {name: file_sha256(path) for name, path in key["files"].items()}
+            if hashes != snapshot["hashes"]:
+                return None
+            # Same bytes under new mtimes: record them so the next start skips hashing
+            snapshot["signature"] = signature
+            self._write(snapshot)
+
+        return snapshot["policies"], snapshot["index"]
+
+    def save(self, key, signature, policies, index):
+        hashes = {name: file_sha256(path) for name, path in key["files"].items()}
+        self._write({
+            "key": key,
+            "signature": signature,
+            "hashes": hashes,
+            "policies": policies,
+            "index": index
+        })
+
+    def _write(self, snapshot):
+        """Write to a temp file and rename, so readers never see a partial snapshot"""
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write policy snapshot: {str(e)}")
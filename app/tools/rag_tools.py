@@ -1,46 +1,336 @@
 import os
 import json
 import re
+import math
+import heapq
+import threading
+from collections import Counter, defaultdict
+from app.tools.cache import LRUTTLCache
+from app.tools.keyword_matcher import SUPPORT_MATCHER, SUPPORT_KEYWORDS
+from app.tools.tracing import tracer
+from app.agents.llm import is_analysis_error
+from app.tools.policy_snapshot import SNAPSHOT_PATH, PolicySnapshot, build_key, fingerprint
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+RETRIEVAL_MODES = ("keyword", "dense", "hybrid")
+DENSE_MIN_SCORE = 0.05
+
+POLICY_FILES = {
+    "refund_policy": "app/policies/refund_policy.txt",
+    "privacy_policy": "app/policies/privacy_policy.txt", 
+    "terms_policy": "app/policies/terms_policy.txt"
+}
+
+RAT_MODES = ("deep", "fast")
+RECOMMENDATIONS = ("process_refund", "offer_replacement", "escalate_to_admin", "request_evidence", "provide_support")
+CONFIDENCE_LEVELS = ("high", "medium", "low")
+
+# Used when the model could not be reached or its answer could not be parsed
+FALLBACK_DECISION = {
+    "reasoning": "Standard resolution recommended based on policy guidelines",
+    "recommendation": "provide_support",
+    "confidence": "medium"
+}
+
+RAT_DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "situation_analysis": {"type": "string", "description": "Issue, timing, evidence, order context, user expectation"},
+        "policy_reasoning": {"type": "string", "description": "Applicable policies, conditions met, exceptions, precedence, compliance"},
+        "decision": {
+            "type": "object",
+            "properties": {
+                "recommendation": {"type": "string", "enum": list(RECOMMENDATIONS)},
+                "confidence": {"type": "string", "enum": list(CONFIDENCE_LEVELS)},
+                "reasoning": {"type": "string", "description": "Justification and next actions"}
+            },
+            "required": ["recommendation", "confidence", "reasoning"]
+        }
+    },
+    "required": ["situation_analysis", "policy_reasoning", "decision"]
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens used for indexing and querying"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class PolicyIndex:
+    """Inverted index with BM25 weights over policy sections
+    
+    Pass the previous index when rebuilding after an edit: sections whose text
+    is unchanged reuse its term counts instead of being tokenized again. The
+    BM25 weights themselves depend on corpus-wide statistics, so they are
+    always recomputed.
+    """
+    
+    def __init__(self, policies, k1=1.5, b=0.75, previous=None):
+        self.policies = policies
+        self.content_lower = [policy["content"].lower() for policy in policies]
+        self.keyword_postings = defaultdict(list)
+        self._issue_boosts = {}
+        
+        reusable = previous.content_terms if previous is not None else {}
+        self.content_terms = {}
+        term_counts = []
+        for doc_id, policy in enumerate(policies):
+            counts = reusable.get(policy["content"])
+            if counts is None:
+                counts = Counter(tokenize(policy["content"]))
+            self.content_terms[policy["content"]] = counts
+            term_counts.append(counts)
+            for keyword in policy["keywords"]:
+                self.keyword_postings[keyword].append(doc_id)
+        
+        self.doc_count = len(policies)
+        doc_lengths = [sum(counts.values()) for counts in term_counts]
+        avg_doc_length = (sum(doc_lengths) / self.doc_count) if self.doc_count else 0.0
+        
+        # Postings hold the full BM25 weight (idf * saturated tf) so a query
+        # only sums precomputed floats for its own terms
+        raw_postings = defaultdict(list)
+        for doc_id, counts in enumerate(term_counts):
+            norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_doc_length)
+            for term, tf in counts.items():
+                raw_postings[term].append((doc_id, tf * (k1 + 1) / (tf + norm)))
+        
+        self.postings = {}
+        for term, docs in raw_postings.items():
+            idf = math.log(1 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.postings[term] = [(doc_id, idf * weight) for doc_id, weight in docs]
+    
+    def _issue_type_boosts(self, issue_type):
+        """Per-doc issue_type boost, computed once per issue type"""
+        boosts = self._issue_boosts.get(issue_type)
+        if boosts is None:
+            boosts = {}
+            for doc_id in self.keyword_postings.get(issue_type, []):
+                boosts[doc_id] = 15
+            for doc_id, content in enumerate(self.content_lower):
+                if issue_type in content:
+                    boosts[doc_id] = boosts.get(doc_id, 0) + 10
+            self._issue_boosts[issue_type] = boosts
+        return boosts
+    
+    def search(self, query, issue_type=None, n_results=3):
+        """Return top (policy, score) pairs for a query"""
+        return [(self.policies[doc_id], score) for doc_id, score in self.search_ids(query, issue_type, n_results)]
+    
+    def search_ids(self, query, issue_type=None, n_results=3):
+        """Return top (doc_id, score) pairs for a query"""
+        if not self.doc_count:
+            return []
+        
+        query_lower = query.lower()
+        query_postings = [self.postings[term] for term in set(tokenize(query_lower)) if term in self.postings]
+        scores = defaultdict(float)
+        
+        for docs in query_postings:
+            for doc_id, weight in docs:
+                scores[doc_id] += weight
+        
+        for keyword in SUPPORT_MATCHER.match(query_lower).get("policy", []):
+            for doc_id in self.keyword_postings.get(keyword, []):
+                scores[doc_id] += 5
+        
+        # Whole-query match: only docs holding the query's rarest term can
+        # contain it, so check those instead of every scored doc
+        if query_postings:
+            for doc_id, _ in min(query_postings, key=len):
+                if query_lower in self.content_lower[doc_id]:
+                    scores[doc_id] += 10
+        
+        if issue_type:
+            for doc_id, boost in self._issue_type_boosts(issue_type).items():
+                scores[doc_id] += boost
+        
+        top = heapq.nlargest(
+            n_results,
+            ((score, -doc_id) for doc_id, score in scores.items() if score > 0)
+        )
+        return [(-neg_id, round(score, 2)) for score, neg_id in top]
+
+
+class _PolicyGeneration:
+    """One consistent set of sections and indexes; a query reads a single generation"""
+    
+    def __init__(self, policies, index, dense_index=None):
+        self.policies = policies
+        self.index = index
+        self.dense_index = dense_index
+
 
 class RAGPolicyEngine:
-    """RAG: Retrieval Augmented Generation for policy documents"""
+    """RAG: Retrieval Augmented Generation for policy documents
+    
+    Sections and indexes live in one _PolicyGeneration. A reload builds the
+    next generation off to the side, re-splitting only the policy files that
+    changed, and swaps it in with a single assignment. In-flight queries finish
+    on the generation they started with.
+    """
+    
+    def __init__(self, retrieval_mode=None, embedder=None, hybrid_alpha=0.5, snapshot_path=SNAPSHOT_PATH):
+        self.retrieval_mode = retrieval_mode or os.getenv("RAG_RETRIEVAL_MODE", "keyword")
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {self.retrieval_mode}")
+        self.embedder = embedder
+        self.hybrid_alpha = hybrid_alpha
+        self.change_listeners = []
+        self.snapshot = PolicySnapshot(snapshot_path) if snapshot_path else None
+        self.loaded_from_snapshot = False
+        self._generation = None
+        self._reload_lock = threading.Lock()
+        self._watch_stop = None
+        self._watch_thread = None
+        self.policy_signature = self._policy_file_signature()
+        self.load_policy_files()
+        source = "snapshot" if self.loaded_from_snapshot else "parsed"
+        print(f"RAG Policy Engine ready - {len(self.policies)} policies loaded ({self.retrieval_mode} retrieval, {source})")
+    
+    @property
+    def policies(self):
+        return self._generation.policies
     
-    def __init__(self):
-        self.policies = self.load_policy_files()
-        print(f"RAG Policy Engine ready - {len(self.policies)} policies loaded")
+    @property
+    def index(self):
+        return self._generation.index
+    
+    @property
+    def dense_index(self):
+        return self._generation.dense_index
+    
+    def _snapshot_key(self):
+        return build_key(POLICY_FILES, fingerprint(SUPPORT_KEYWORDS["policy"]))
     
     def load_policy_files(self):
-        """Load and parse policy text files"""
-        policy_files = {
-            "refund_policy": "app/policies/refund_policy.txt",
-            "privacy_policy": "app/policies/privacy_policy.txt", 
-            "terms_policy": "app/policies/terms_policy.txt"
-        }
+        """Load policies and their index, from the on-disk snapshot when the files are unchanged"""
+        snapshot_key = self._snapshot_key()
+        cached = self.snapshot.load(snapshot_key, self.policy_signature) if self.snapshot else None
+        self.loaded_from_snapshot = cached is not None
         
-        policies = []
+        if cached:
+            policies, index = cached
+        else:
+            policies = [
+                policy
+                for policy_name, file_path in POLICY_FILES.items()
+                for policy in self._parse_policy_file(policy_name, file_path)
+            ]
+            index = PolicyIndex(policies)
+            if self.snapshot:
+                self.snapshot.save(snapshot_key, self.policy_signature, policies, index)
         
-        for policy_name, file_path in policy_files.items():
+        dense_index = self._build_dense_index(policies) if self.retrieval_mode != "keyword" else None
+        self._generation = _PolicyGeneration(policies, index, dense_index)
+        return policies
+    
+    def _parse_policy_file(self, policy_name, file_path):
+        """Read, split and keyword one policy file"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            print(f"Policy file not found: {file_path}")
+            return self._get_fallback_policy(policy_name)
+        
+        return [
+            {
+                "id": f"{policy_name}_{i}",
+                "policy_type": policy_name,
+                "content": section,
+                "keywords": self._extract_keywords(section)
+            }
+            for i, section in enumerate(self._split_into_sections(content))
+        ]
+    
+    def _policy_file_signature(self):
+        """(mtime, size) per policy file; None for files that are missing"""
+        signature = {}
+        for policy_name, file_path in POLICY_FILES.items():
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                sections = self._split_into_sections(content)
-                
-                for i, section in enumerate(sections):
-                    policies.append({
-                        "id": f"{policy_name}_{i}",
-                        "policy_type": policy_name,
-                        "content": section,
-                        "keywords": self._extract_keywords(section)
-                    })
-                    
-            except FileNotFoundError:
-                print(f"Policy file not found: {file_path}")
-                fallback = self._get_fallback_policy(policy_name)
-                if fallback:
-                    policies.extend(fallback)
+                stat = os.stat(file_path)
+                signature[policy_name] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature[policy_name] = None
+        return signature
+    
+    def add_change_listener(self, callback):
+        """Register callback(changed_policy_names) to run after policies are reloaded"""
+        self.change_listeners.append(callback)
+    
+    def reload_if_changed(self):
+        """Re-index the policy files that changed on disk and swap them in; returns changed names
         
-        return policies
+        Only changed files are re-read and re-split. Unchanged sections keep
+        their keywords, term counts and embedding rows. Change listeners run
+        after the swap with the changed policy names.
+        """
+        with self._reload_lock:
+            signature = self._policy_file_signature()
+            changed = [name for name in POLICY_FILES if signature[name] != self.policy_signature.get(name)]
+            if not changed:
+                return []
+            
+            current = self._generation
+            sections = {
+                name: [policy for policy in current.policies if policy["policy_type"] == name]
+                for name in POLICY_FILES
+            }
+            for name in changed:
+                sections[name] = self._parse_policy_file(name, POLICY_FILES[name])
+            policies = [policy for name in POLICY_FILES for policy in sections[name]]
+            
+            index = PolicyIndex(policies, previous=current.index)
+            dense_index = None
+            if self.retrieval_mode != "keyword":
+                dense_index = self._build_dense_index(policies, previous=current.dense_index)
+            
+            self._generation = _PolicyGeneration(policies, index, dense_index)
+            self.policy_signature = signature
+            if self.snapshot:
+                self.snapshot.save(self._snapshot_key(), signature, policies, index)
+            
+            # Matrix files are keyed on content, so each edit would otherwise leave one behind
+            previous_dense = current.dense_index
+            if previous_dense is not None and dense_index is not None and previous_dense.path != dense_index.path:
+                previous_dense.remove_file()
+        
+        print(f"Policies reloaded after change: {', '.join(changed)}")
+        for callback in self.change_listeners:
+            callback(changed)
+        return changed
+    
+    def start_watching(self, interval=2.0):
+        """Poll the policy files' mtimes every interval seconds on a daemon thread"""
+        if self._watch_thread is not None and self._watch_thread.is_alive():
+            return
+        self._watch_stop = threading.Event()
+        self._watch_thread = threading.Thread(
+            target=self._watch, args=(interval, self._watch_stop), name="policy-watcher", daemon=True
+        )
+        self._watch_thread.start()
+    
+    def stop_watching(self):
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_thread.join()
+            self._watch_thread = None
+    
+    def _watch(self, interval, stop):
+        while not stop.wait(interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                print(f"Policy reload failed, keeping current policies: {str(e)}")
+    
+    def _build_dense_index(self, policies, previous=None):
+        """Embed every section into the memory-mapped embedding matrix"""
+        from app.tools.embeddings import EmbeddingIndex, get_embedder
+        
+        if self.embedder is None:
+            self.embedder = get_embedder()
+        return EmbeddingIndex(self.embedder, [policy["content"] for policy in policies], previous=previous)
     
     def _split_into_sections(self, content):
         """Split policy content into sections"""
@@ -74,22 +364,7 @@ class RAGPolicyEngine:
     
     def _extract_keywords(self, text):
         """Extract keywords from text"""
-        keywords = []
-        text_lower = text.lower()
-        
-        policy_keywords = [
-            "damage", "broken", "defect", "crack", "photo", "evidence",
-            "missing", "not delivered", "lost", "incomplete",
-            "wrong", "incorrect", "different", "mismatch",
-            "refund", "replacement", "exchange", "return",
-            "24 hours", "48 hours", "7 days", "immediate"
-        ]
-        
-        for keyword in policy_keywords:
-            if keyword in text_lower:
-                keywords.append(keyword)
-        
-        return keywords
+        return SUPPORT_MATCHER.match(text).get("policy", [])
     
     def _get_fallback_policy(self, policy_type):
         """Fallback policies if files don't exist"""
@@ -114,41 +389,24 @@ class RAGPolicyEngine:
     
     def query_policy(self, query, issue_type=None, n_results=3):
         """RAG: Retrieve relevant policies based on query"""
-        query_lower = query.lower()
-        scored_policies = []
-        
-        for policy in self.policies:
-            score = 0
-            
-            if query_lower in policy["content"].lower():
-                score += 10
-            
-            for keyword in policy["keywords"]:
-                if keyword in query_lower:
-                    score += 5
-            
-            if issue_type:
-                if issue_type in policy["keywords"]:
-                    score += 15
-                if issue_type in policy["content"].lower():
-                    score += 10
-            
-            if score > 0:
-                scored_policies.append({
-                    "policy": policy,
-                    "score": score
-                })
-        
-        scored_policies.sort(key=lambda x: x["score"], reverse=True)
-        top_policies = scored_policies[:n_results]
+        generation = self._generation
+        with tracer.span("rag.query", mode=self.retrieval_mode) as span:
+            if self.retrieval_mode == "dense":
+                top_policies = self._dense_search(generation, query, issue_type, n_results)
+            elif self.retrieval_mode == "hybrid":
+                top_policies = self._hybrid_search(generation, query, issue_type, n_results)
+            else:
+                top_policies = generation.index.search(query, issue_type, n_results)
+            span.set(hits=len(top_policies))
         
         if top_policies:
             context = []
-            for item in top_policies:
+            for policy, score in top_policies:
                 context.append({
-                    "content": item["policy"]["content"],
-                    "policy_type": item["policy"]["policy_type"],
-                    "relevance_score": item["score"]
+                    "policy_id": policy["id"],
+                    "content": policy["content"],
+                    "policy_type": policy["policy_type"],
+                    "relevance_score": score
                 })
             
             return {
@@ -162,17 +420,63 @@ class RAGPolicyEngine:
             "context": [],
             "message": "No specific policy found"
         }
+    
+    def _dense_query_text(self, query, issue_type):
+        return f"{issue_type} {query}" if issue_type else query
+    
+    def _dense_search(self, generation, query, issue_type, n_results):
+        """Top-k by cosine similarity against the embedding matrix"""
+        hits = generation.dense_index.search(self._dense_query_text(query, issue_type), n_results)
+        return [
+            (generation.policies[doc_id], round(score, 4))
+            for doc_id, score in hits
+            if score > DENSE_MIN_SCORE
+        ]
+    
+    def _hybrid_search(self, generation, query, issue_type, n_results):
+        """Fuse dense cosine scores with max-normalized keyword scores"""
+        pool_size = n_results * 5
+        keyword_scores = dict(generation.index.search_ids(query, issue_type, pool_size))
+        dense_scores = generation.dense_index.scores(self._dense_query_text(query, issue_type))
+        
+        candidates = set(keyword_scores)
+        candidates.update(doc_id for doc_id, _ in generation.dense_index.top_k(dense_scores, pool_size))
+        
+        max_keyword = max(keyword_scores.values(), default=0) or 1
+        fused = []
+        for doc_id in candidates:
+            score = (self.hybrid_alpha * float(dense_scores[doc_id]) +
+                     (1 - self.hybrid_alpha) * keyword_scores.get(doc_id, 0) / max_keyword)
+            if score > DENSE_MIN_SCORE:
+                fused.append((score, -doc_id))
+        
+        fused = heapq.nlargest(n_results, fused)
+        return [(generation.policies[-neg_id], round(score, 4)) for score, neg_id in fused]
+    
+    def is_system_ready(self):
+        """Check if policies are loaded and indexed"""
+        return bool(self.policies)
 
 
 class RATReasoningEngine:
     """RAT: Retrieval Augmented Thinking for step-by-step policy reasoning"""
     
-    def __init__(self, llm_manager):
+    def __init__(self, llm_manager, default_mode=None):
         self.llm_manager = llm_manager
-        print("RAT Reasoning Engine initialized")
+        self.default_mode = default_mode or os.getenv("RAT_MODE", "deep")
+        print(f"RAT Reasoning Engine initialized ({self.default_mode} mode)")
     
-    def think_through_policy(self, retrieved_policies, issue_type, order_data, user_query):
-        """RAT: Multi-step reasoning through retrieved policies"""
+    def think_through_policy(self, retrieved_policies, issue_type, order_data, user_query, mode=None):
+        """RAT: Multi-step reasoning through retrieved policies
+        
+        mode="deep" runs three sequential supervisor calls, mode="fast" does
+        all three steps in one structured JSON completion.
+        """
+        mode = mode or self.default_mode
+        if mode not in RAT_MODES:
+            raise ValueError(f"Unknown RAT mode: {mode}")
+        if mode == "fast":
+            return self._think_fast(retrieved_policies, issue_type, order_data, user_query)
         
         #Analyze
         situation_analysis = self._analyze_situation(issue_type, order_data, user_query)
@@ -183,6 +487,75 @@ class RATReasoningEngine:
         #Determine final recommendation
         final_decision = self._make_final_decision(policy_reasoning, situation_analysis)
         
+        # A step that fell back instead of hearing from the model must not be reused as a decision
+        degraded = (
+            any(is_analysis_error(text) for text in (situation_analysis, policy_reasoning, final_decision["reasoning"]))
+            or situation_analysis == self._situation_fallback(issue_type, order_data)
+            or policy_reasoning == self._policy_fallback(retrieved_policies)
+            or final_decision == FALLBACK_DECISION
+        )
+        
+        return {
+            "thinking_process": {
+                "situation_analysis": situation_analysis,
+                "policy_reasoning": policy_reasoning,
+                "final_decision": final_decision
+            },
+            "recommendation": final_decision["recommendation"],
+            "reasoning": final_decision["reasoning"],
+            "confidence": final_decision["confidence"],
+            "degraded": degraded
+        }
+    
+    def _situation_fallback(self, issue_type, order_data):
+        return f"Basic situation analysis: {issue_type} issue with order {order_data.get('order_id', 'unknown')}"
+    
+    def _policy_fallback(self, retrieved_policies):
+        return f"Policy reasoning: Standard policies apply for {retrieved_policies[0]['policy_type'] if retrieved_policies else 'general'} cases"
+    
+    def _think_fast(self, retrieved_policies, issue_type, order_data, user_query):
+        """RAT in a single call: situation, policy reasoning and decision as one JSON object"""
+        
+        policies_text = "\n".join([p["content"] for p in retrieved_policies])
+        
+        fast_prompt = f"""
+        <rat_structured_reasoning>
+        ISSUE_TYPE: {issue_type}
+        ORDER_DATA: {order_data}
+        USER_QUERY: {user_query}
+        APPLICABLE_POLICIES: {policies_text}
+        
+        Think step by step, then fill every field:
+        - situation_analysis: issue classification, timing vs policy limits, evidence available or needed, order context, what the user wants
+        - policy_reasoning: which policies apply, whether their conditions are met, exceptions, precedence, compliance or escalation
+        - decision: the action to take, how confident you are, and the justification with next actions
+        
+        Respond with JSON matching this schema:
+        {json.dumps(RAT_DECISION_SCHEMA)}
+        </rat_structured_reasoning>
+        """
+        
+        with tracer.span("rat.fast") as span:
+            result = self.llm_manager.get_structured_analysis(fast_prompt, max_tokens=900)
+            valid = isinstance(result, dict) and isinstance(result.get("decision"), dict)
+            span.set(fallback=not valid)
+        
+        if not valid:
+            final_decision = dict(FALLBACK_DECISION)
+            situation_analysis = self._situation_fallback(issue_type, order_data)
+            policy_reasoning = self._policy_fallback(retrieved_policies)
+        else:
+            decision = result["decision"]
+            recommendation = decision.get("recommendation")
+            confidence = decision.get("confidence")
+            final_decision = {
+                "reasoning": str(decision.get("reasoning", "")),
+                "recommendation": recommendation if recommendation in RECOMMENDATIONS else "provide_support",
+                "confidence": confidence if confidence in CONFIDENCE_LEVELS else "medium"
+            }
+            situation_analysis = str(result.get("situation_analysis", ""))
+            policy_reasoning = str(result.get("policy_reasoning", ""))
+        
         return {
             "thinking_process": {
                 "situation_analysis": situation_analysis,
@@ -191,7 +564,8 @@ class RATReasoningEngine:
             },
             "recommendation": final_decision["recommendation"],
             "reasoning": final_decision["reasoning"],
-            "confidence": final_decision["confidence"]
+            "confidence": final_decision["confidence"],
+            "degraded": not valid
         }
     
     def _analyze_situation(self, issue_type, order_data, user_query):
@@ -215,11 +589,13 @@ class RATReasoningEngine:
         </rat_situation_analysis>
         """
         
-        try:
-            analysis = self.llm_manager.get_supervisor_analysis(analysis_prompt, max_tokens=600)
-            return analysis
-        except:
-            return f"Basic situation analysis: {issue_type} issue with order {order_data.get('order_id', 'unknown')}"
+        with tracer.span("rat.analyze") as span:
+            try:
+                return self.llm_manager.get_supervisor_analysis(analysis_prompt, max_tokens=600)
+            except Exception as e:
+                span.fail(e)
+                print(f"RAT situation analysis failed: {str(e)}")
+                return self._situation_fallback(issue_type, order_data)
     
     def _reason_through_policies(self, retrieved_policies, situation_analysis):
         """RAT Step 2: Reason through applicable policies"""
@@ -243,11 +619,13 @@ class RATReasoningEngine:
         </rat_policy_reasoning>
         """
         
-        try:
-            reasoning = self.llm_manager.get_supervisor_analysis(reasoning_prompt, max_tokens=700)
-            return reasoning
-        except:
-            return f"Policy reasoning: Standard policies apply for {retrieved_policies[0]['policy_type'] if retrieved_policies else 'general'} cases"
+        with tracer.span("rat.reason") as span:
+            try:
+                return self.llm_manager.get_supervisor_analysis(reasoning_prompt, max_tokens=700)
+            except Exception as e:
+                span.fail(e)
+                print(f"RAT policy reasoning failed: {str(e)}")
+                return self._policy_fallback(retrieved_policies)
     
     def _make_final_decision(self, policy_reasoning, situation_analysis):
         """RAT Step 3: Make final decision based on reasoning"""
@@ -269,26 +647,27 @@ class RATReasoningEngine:
         </rat_final_decision>
         """
         
-        try:
-            decision = self.llm_manager.get_supervisor_analysis(decision_prompt, max_tokens=500)
-            
-            confidence = "medium"
-            if "high confidence" in decision.lower():
-                confidence = "high"
-            elif "low confidence" in decision.lower():
-                confidence = "low"
-            
-            return {
-                "reasoning": decision,
-                "recommendation": self._extract_recommendation(decision),
-                "confidence": confidence
-            }
-        except:
-            return {
-                "reasoning": "Standard resolution recommended based on policy guidelines",
-                "recommendation": "provide_support",
-                "confidence": "medium"
-            }
+        with tracer.span("rat.decide") as span:
+            try:
+                decision = self.llm_manager.get_supervisor_analysis(decision_prompt, max_tokens=500)
+                
+                confidence = "medium"
+                if "high confidence" in decision.lower():
+                    confidence = "high"
+                elif "low confidence" in decision.lower():
+                    confidence = "low"
+                
+                recommendation = self._extract_recommendation(decision)
+                span.set(recommendation=recommendation, confidence=confidence)
+                return {
+                    "reasoning": decision,
+                    "recommendation": recommendation,
+                    "confidence": confidence
+                }
+            except Exception as e:
+                span.fail(e)
+                print(f"RAT final decision failed: {str(e)}")
+                return dict(FALLBACK_DECISION)
     
     def _extract_recommendation(self, decision_text):
         """Extract actionable recommendation from decision"""
@@ -309,32 +688,93 @@ class RATReasoningEngine:
 class PolicyReasoningSystem:
     """Combined RAG + RAT system for intelligent policy handling"""
     
-    def __init__(self, llm_manager):
+    def __init__(self, llm_manager, cache_size=None, cache_ttl=None, policy_watch_interval=None):
         self.rag_engine = RAGPolicyEngine()  # For retrieval
         self.rat_engine = RATReasoningEngine(llm_manager)  # For reasoning
+        self.decision_cache = LRUTTLCache(
+            max_size=cache_size or int(os.getenv("DECISION_CACHE_SIZE", "512")),
+            ttl=cache_ttl if cache_ttl is not None else float(os.getenv("DECISION_CACHE_TTL", "900"))
+        )
+        self.rag_engine.add_change_listener(self._on_policies_changed)
+        
+        # Policy edits are picked up in the background; 0 turns the watcher off
+        if policy_watch_interval is None:
+            policy_watch_interval = float(os.getenv("POLICY_WATCH_INTERVAL", "2"))
+        if policy_watch_interval > 0:
+            self.rag_engine.start_watching(policy_watch_interval)
         print("Combined RAG + RAT Policy System ready")
     
-    def process_policy_query(self, issue_type, order_data, user_query):
+    def _on_policies_changed(self, changed_policies):
+        """Decisions were made against the old policy text, so drop them all"""
+        self.decision_cache.invalidate()
+    
+    def _decision_cache_key(self, issue_type, order_data, rag_result, reasoning_mode):
+        """Canonical case features; deliberately excludes the raw user text"""
+        return (
+            str(issue_type or "").strip().lower(),
+            str(order_data.get("status") or "").strip().lower(),
+            str(order_data.get("payment_method") or "").strip().lower(),
+            str(order_data.get("damage_severity") or "").strip().lower(),
+            tuple(sorted(item["policy_id"] for item in rag_result["context"])),
+            reasoning_mode or self.rat_engine.default_mode
+        )
+    
+    def _cached_decision_reasoning(self, issue_type, order_data, rag_result, decision):
+        """Short justification of a reused decision, written for this order only"""
+        policy_types = ", ".join(sorted({item["policy_type"] for item in rag_result["context"]}))
+        return (
+            f"{decision['recommendation']} ({decision['confidence']} confidence) for a {issue_type} issue on "
+            f"order {order_data.get('order_id', 'unknown')} ({order_data.get('status') or 'unknown'} status, "
+            f"{order_data.get('payment_method') or 'unknown'} payment), per the {policy_types} policies"
+        )
+    
+    def process_policy_query(self, issue_type, order_data, user_query, reasoning_mode=None):
         """Full RAG + RAT pipeline"""
         
-        # RAG Retrieving
-        rag_result = self.rag_engine.query_policy(user_query, issue_type, n_results=3)
-        
-        if not rag_result["found"]:
-            return {
-                "system": "RAG only",
-                "recommendation": "manual_review",
-                "reasoning": "No applicable policies found in knowledge base",
-                "confidence": "low"
-            }
-        
-        # RAT Thinking
-        rat_result = self.rat_engine.think_through_policy(
-            rag_result["context"], 
-            issue_type, 
-            order_data, 
-            user_query
-        )
+        with tracer.span("policy.decision", issue_type=issue_type) as span:
+            # RAG Retrieving
+            rag_result = self.rag_engine.query_policy(user_query, issue_type, n_results=3)
+            
+            if not rag_result["found"]:
+                span.set(found=False)
+                return {
+                    "system": "RAG only",
+                    "recommendation": "manual_review",
+                    "reasoning": "No applicable policies found in knowledge base",
+                    "confidence": "low"
+                }
+            
+            # RAT Thinking, unless an equivalent case was already decided. Only the
+            # case-level decision is cached: the reasoning prose quotes the order and
+            # message it was written for, so a hit gets reasoning for its own order
+            cache_key = self._decision_cache_key(issue_type, order_data, rag_result, reasoning_mode)
+            cached = self.decision_cache.get(cache_key)
+            cache_status = "hit"
+            
+            if cached is not None:
+                rat_result = {
+                    **cached,
+                    "thinking_process": None,
+                    "reasoning": self._cached_decision_reasoning(issue_type, order_data, rag_result, cached)
+                }
+            else:
+                cache_status = "miss"
+                rat_result = self.rat_engine.think_through_policy(
+                    rag_result["context"], 
+                    issue_type, 
+                    order_data, 
+                    user_query,
+                    mode=reasoning_mode
+                )
+                if rat_result["degraded"]:
+                    cache_status = "degraded"
+                else:
+                    self.decision_cache.set(cache_key, {
+                        key: rat_result[key] for key in ("recommendation", "confidence", "degraded")
+                    })
+            
+            span.set(decision_cache=cache_status, recommendation=rat_result["recommendation"])
+            tracer.registry.inc("support_decision_cache_total", 1, "RAT decision cache lookups", result=cache_status)
         
         return {
             "system": "RAG + RAT",
@@ -342,9 +782,10 @@ class PolicyReasoningSystem:
             "thinking_process": rat_result["thinking_process"],
             "recommendation": rat_result["recommendation"],
             "reasoning": rat_result["reasoning"],
-            "confidence": rat_result["confidence"]
+            "confidence": rat_result["confidence"],
+            "decision_cache": cache_status
         }
     
     def is_system_ready(self):
         """Check if both RAG and RAT systems are ready"""
-        return self.rag_engine.is_system_ready()
+        return self.rag_engine.is_system_ready()
\ No newline at end of file
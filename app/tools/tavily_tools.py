@@ -1,40 +1,112 @@
-import requests
 import os
+import threading
 from dotenv import load_dotenv
+from app.tools.cache import LRUTTLCache
+from app.tools.keyword_matcher import SUPPORT_MATCHER
+from app.tools.tracing import tracer
 
 load_dotenv()
 
-class TavilyMCP:
+
+class _InflightSearch:
+    """One outbound search that concurrent identical queries wait on"""
+    
     def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class TavilyMCP:
+    def __init__(self, base_url=None, cache_ttl=300, negative_cache_ttl=60, cache_size=1024, timeout=10):
         self.api_key = os.getenv("TAVILY_API_KEY")
-        self.base_url = "https://api.tavily.com/search"
+        self.base_url = base_url or os.getenv("TAVILY_BASE_URL", "https://api.tavily.com/search")
+        self.timeout = timeout
+        self.negative_cache_ttl = negative_cache_ttl
+        self.price_cache = LRUTTLCache(max_size=cache_size, ttl=cache_ttl)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+    
+    @property
+    def session(self):
+        """Pooled keep-alive session, created (and requests imported) on the first search"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
     
     def should_search_price(self, user_query):
         """Detect if user is asking for current prices"""
-        price_keywords = [
-            "price", "cost", "rate", "kitna hai", "how much", "kitne ka", 
-            "kitne mein", "price kya hai", "rate kya hai", "cost kitna"
-        ]
-        return any(keyword in user_query.lower() for keyword in price_keywords)
+        return SUPPORT_MATCHER.matches(user_query, "price")
     
     def is_inappropriate_for_support(self, user_query):
         """Detect inappropriate queries for customer support"""
-        inappropriate_keywords = [
-            "dating", "relationship", "girlfriend", "boyfriend", "marriage",  
-            "politics", "religion", "sports", "movies", "celebrity",
-            "sex", "adult", "xxx", "porn",
-            "coding", "programming", "software development",
-            "how are you", "what's your name", "where do you live", "tell me joke"
-        ]
-        
-        query_lower = user_query.lower()
-        return any(keyword in query_lower for keyword in inappropriate_keywords)
+        return SUPPORT_MATCHER.matches(user_query, "inappropriate")
     
     def search_product_price(self, product_name, location=""):
-        """Search for current product prices using Tavily MCP"""
+        """Search for current product prices using Tavily MCP
+        
+        Results are cached per (product, location); misses are cached for a
+        shorter negative TTL, errors are not cached. Concurrent identical
+        queries share one outbound request.
+        """
         if not self.api_key:
             return {"error": "Tavily API not configured", "fallback": True}
         
+        key = (" ".join(product_name.lower().split()), " ".join((location or "").lower().split()))
+        cached = self.price_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        
+        with self._inflight_lock:
+            search = self._inflight.get(key)
+            is_leader = search is None
+            if is_leader:
+                search = self._inflight[key] = _InflightSearch()
+                self.upstream_calls += 1
+            else:
+                self.coalesced_calls += 1
+        
+        if not is_leader:
+            if search.done.wait(self.timeout + 1) and search.result is not None:
+                return dict(search.result)
+            return {"error": "Search timed out", "fallback": True}
+        
+        try:
+            result = self._fetch_product_price(product_name, location)
+            if result.get("found"):
+                self.price_cache.set(key, result)
+            elif "error" not in result:
+                self.price_cache.set(key, result, ttl=self.negative_cache_ttl)
+            search.result = result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            search.done.set()
+        
+        return dict(result)
+    
+    def cache_stats(self):
+        """Price cache counters plus outbound and coalesced call counts"""
+        return {
+            **self.price_cache.stats(),
+            "upstream_calls": self.upstream_calls,
+            "coalesced_calls": self.coalesced_calls
+        }
+    
+    def _fetch_product_price(self, product_name, location):
+        """One outbound search over the pooled session"""
+        
         price_query = f"{product_name} price Swiggy Instamart {location} current rate cost 2025"
         
         payload = {
@@ -45,20 +117,24 @@ class TavilyMCP:
             "max_results": 5
         }
         
-        try:
-            response = requests.post(self.base_url, json=payload, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                price_info = self._extract_price_info(data, product_name)
-                return {
-                    "found": price_info["found"],
-                    "price_text": price_info["text"]
-                }
-            else:
-                return {"error": f"Search failed: {response.status_code}", "fallback": True}
-        
-        except Exception as e:
-            return {"error": str(e), "fallback": True}
+        with tracer.span("tavily.search") as span:
+            try:
+                response = self.session.post(self.base_url, json=payload, timeout=self.timeout)
+                span.set(status=response.status_code)
+                if response.status_code == 200:
+                    data = response.json()
+                    price_info = self._extract_price_info(data, product_name)
+                    span.set(found=price_info["found"])
+                    return {
+                        "found": price_info["found"],
+                        "price_text": price_info["text"]
+                    }
+                else:
+                    return {"error": f"Search failed: {response.status_code}", "fallback": True}
+            
+            except Exception as e:
+                span.fail(e)
+                return {"error": str(e), "fallback": True}
     
     def _extract_price_info(self, search_data, product_name):
         """Extract price information from search results"""
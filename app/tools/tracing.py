@@ -0,0 +1,369 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; shared by every latency histogram
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters, histograms and callback gauges rendered as Prometheus text"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def inc(self, name, amount=1, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def register_gauge(self, name, callback, help_text=""):
+        """callback() returns a number, or a {label_value_tuple_or_dict: number} mapping"""
+        with self._lock:
+            self._help[name] = ("gauge", help_text)
+            self._gauges[name] = callback
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in self._histograms.items()}
+            gauges = dict(self._gauges)
+            help_entries = dict(self._help)
+
+        lines = []
+        for name in sorted(help_entries):
+            metric_type, help_text = help_entries[name]
+            lines.append(f"# HELP {name} {help_text or name}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+            if metric_type == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_label_text(labels)} {value}")
+
+            elif metric_type == "histogram":
+                for (metric, labels), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(self.buckets, histogram["buckets"]):
+                        lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {histogram['count']}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {histogram['sum']}")
+                    lines.append(f"{name}_count{_label_text(labels)} {histogram['count']}")
+
+            else:
+                try:
+                    value = gauges[name]()
+                except Exception as e:
+                    print(f"Gauge {name} failed: {str(e)}")
+                    continue
+                if isinstance(value, dict):
+                    for labels, sample in sorted(value.items(), key=lambda item: str(item[0])):
+                        label_items = tuple(sorted(labels.items())) if isinstance(labels, dict) else labels
+                        lines.append(f"{name}{_label_text(label_items)} {sample}")
+                else:
+                    lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    """One timed stage; attributes and token counts end up in the turn trace"""
+
+    def __init__(self, name, depth, offset_ms, attrs):
+        self.name = name
+        self.depth = depth
+        self.offset_ms = offset_ms
+        self.attrs = dict(attrs)
+        self.duration_ms = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def fail(self, error):
+        """Mark the span failed for an error that was handled rather than raised"""
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self):
+        record = {
+            "name": self.name,
+            "depth": self.depth,
+            "start_ms": round(self.offset_ms, 3),
+            "duration_ms": round(self.duration_ms or 0.0, 3)
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class TurnTrace:
+    """All spans recorded while handling one user message"""
+
+    def __init__(self, session_id=None, **attrs):
+        self.trace_id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.attrs = dict(attrs)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.spans = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.error = None
+        self._lock = threading.Lock()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def add_tokens(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "error": self.error,
+            "attrs": self.attrs,
+            "spans": [span.to_dict() for span in self.spans]
+        }
+
+
+class Tracer:
+    """Span and turn instrumentation feeding a metrics registry and trace sinks
+
+    Spans always update the latency histograms. Spans opened inside
+    tracer.turn() are also collected into that turn's trace. When the turn
+    ends, the trace is passed to every sink (for example the SQLite
+    TraceSink). The current turn and span live in context variables, so
+    threads and asyncio tasks each see their own.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.sinks = []
+
+    def add_sink(self, sink):
+        """Register sink(turn_trace) to receive every finished turn"""
+        if sink not in self.sinks:
+            self.sinks.append(sink)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span, turn = self._open_span(name, attrs)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._close_span(span, turn, time.perf_counter() - start)
+
+    @contextmanager
+    def stream_span(self, name, **attrs):
+        """span() for use inside a generator, kept open across its yields
+
+        The span never becomes the current span, so no context variable token
+        outlives a yield: a consumer that stops early may finalize the
+        generator from another context. Spans opened within it nest under the
+        caller's span, and token usage must be passed in with
+        record_tokens(..., span=span).
+        """
+        span, turn = self._open_span(name, attrs)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            self._close_span(span, turn, time.perf_counter() - start)
+
+    def _open_span(self, name, attrs):
+        turn = _current_turn.get()
+        parent = _current_span.get()
+        return Span(name, parent.depth + 1 if parent else 0, turn.elapsed_ms() if turn else 0.0, attrs), turn
+
+    def _close_span(self, span, turn, elapsed):
+        span.duration_ms = elapsed * 1000
+        self.registry.observe("support_span_duration_seconds", elapsed,
+                              "Latency of each pipeline stage", span=span.name)
+        if span.error:
+            self.registry.inc("support_span_errors_total", 1, "Pipeline stage failures", span=span.name)
+        if turn is not None:
+            turn.add_span(span)
+
+    def traced(self, name):
+        """Decorator form of span() for whole methods"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_tokens(self, model, prompt_tokens, completion_tokens, span=None):
+        """Count LLM token usage against the model, the span (default: current) and the current turn"""
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        self.registry.inc("support_llm_tokens_total", prompt_tokens, "LLM tokens used", model=model, kind="prompt")
+        self.registry.inc("support_llm_tokens_total", completion_tokens, "LLM tokens used", model=model, kind="completion")
+        span = span or _current_span.get()
+        if span is not None:
+            span.set(model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        turn = _current_turn.get()
+        if turn is not None:
+            turn.add_tokens(prompt_tokens, completion_tokens)
+
+    @contextmanager
+    def turn(self, session_id=None, **attrs):
+        """Collect one user message's spans; open it where the turn is driven, never inside a generator"""
+        trace = TurnTrace(session_id, **attrs)
+        token = _current_turn.set(trace)
+        try:
+            yield trace
+        except Exception as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_turn.reset(token)
+            trace.duration_ms = trace.elapsed_ms()
+            route = trace.attrs.get("route", "unknown")
+            self.registry.observe("support_turn_duration_seconds", trace.duration_ms / 1000,
+                                  "End-to-end latency of a support turn", route=route)
+            self.registry.inc("support_turns_total", 1, "Support turns handled", route=route)
+            for sink in self.sinks:
+                try:
+                    sink(trace)
+                except Exception as e:
+                    print(f"Trace sink failed: {str(e)}")
+
+    def current_turn(self):
+        return _current_turn.get()
+
+
+class TraceSink:
+    """Persists finished turns to the turn_traces table through the write-behind writer"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def __call__(self, trace):
+        record = trace.to_dict()
+        self.writer.submit("""
+            INSERT INTO turn_traces (trace_id, session_id, started_at, duration_ms, route,
+                                     prompt_tokens, completion_tokens, error, spans)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            record["trace_id"],
+            record["session_id"],
+            record["started_at"],
+            record["duration_ms"],
+            record["attrs"].get("route"),
+            record["prompt_tokens"],
+            record["completion_tokens"],
+            record["error"],
+            json.dumps({"attrs": record["attrs"], "spans": record["spans"]}, default=str)
+        ))
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host="0.0.0.0", registry=None):
+    """Serve GET /metrics on a daemon thread; port from METRICS_PORT, 0 or unset disables"""
+    global _metrics_server
+    port = int(port if port is not None else os.getenv("METRICS_PORT", "0"))
+    if not port:
+        return None
+    registry = registry or tracer.registry
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError as e:
+                print(f"Metrics endpoint not started on port {port}: {str(e)}")
+                return None
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+            print(f"Metrics endpoint on http://{host}:{port}/metrics")
+        return _metrics_server
+
+
+# Process-wide tracer used by every instrumented module
+tracer = Tracer()
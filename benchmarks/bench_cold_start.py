@@ -0,0 +1,79 @@
+"""Cold-start benchmark: process launch to first answer, in fresh interpreters.
+
+Each run launches a new Python process that imports the support stack, builds
+SupportAgents, answers one fast-path turn and one policy retrieval, and
+reports wall-clock milestones. Scenarios:
+
+    no snapshot     policy index parsed from the text files (snapshot deleted)
+    snapshot        policy index loaded from app/index/policy_index.pkl
+    eager imports   snapshot, plus groq/requests/numpy/PIL imported up front
+                    the way the modules used to
+
+Run from the repo root:
+    python -m benchmarks.bench_cold_start
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from app.tools.policy_snapshot import SNAPSHOT_PATH
+
+RUNS = 5
+
+CHILD = """
+import json, sys, time
+marks = {}
+if "--eager" in sys.argv:
+    import groq, requests, numpy, PIL.Image
+from app.agents.cs_agents import SupportAgents
+marks["imported"] = time.time()
+agents = SupportAgents()
+marks["ready"] = time.time()
+state = {"current_order": None, "issue_type": "damage", "current_ticket": None}
+agents.classify_and_handle_query("mera order toot gaya", [], state)
+marks["first_answer"] = time.time()
+agents.policy_system.rag_engine.query_policy("item arrived damaged", "damage")
+marks["first_policy"] = time.time()
+marks["snapshot"] = agents.policy_system.rag_engine.loaded_from_snapshot
+print(json.dumps(marks))
+"""
+
+
+def run_child(eager=False):
+    args = [sys.executable, "-c", CHILD] + (["--eager"] if eager else [])
+    start = time.time()
+    output = subprocess.run(args, capture_output=True, text=True, check=True).stdout
+    marks = json.loads(output.strip().splitlines()[-1])
+    return {key: (value - start) * 1000 for key, value in marks.items() if key != "snapshot"}
+
+
+def scenario(name, runs, prepare=None, eager=False):
+    samples = []
+    for _ in range(runs):
+        if prepare:
+            prepare()
+        samples.append(run_child(eager))
+    medians = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+    print(f"{name:<16}" + "".join(f"{medians[key]:>14.1f}" for key in ("imported", "ready", "first_answer", "first_policy")))
+    return medians
+
+
+def drop_snapshot():
+    if os.path.exists(SNAPSHOT_PATH):
+        os.remove(SNAPSHOT_PATH)
+
+
+def main():
+    print(f"median of {RUNS} fresh processes, ms since launch")
+    print(f"{'scenario':<16}{'imported':>14}{'ready':>14}{'first answer':>14}{'first policy':>14}")
+    scenario("no snapshot", RUNS, prepare=drop_snapshot)
+    run_child()  # leave a fresh snapshot behind
+    scenario("snapshot", RUNS)
+    scenario("eager imports", RUNS, eager=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark: connect-per-call SQLite access vs the shared connection pool.
+
+Measures get_order_by_id and save_conversation_with_rag_rat throughput on a
+scratch database. get_order_by_id "after" is served by the order repository's
+cache; the "cold" rows drop that cache first to compare one query per order
+with BATCH-sized IN queries, in orders per second. With the default DB_WRITE_MODE=async the "after" save figure
+is the request-path cost of queueing a row; run with DB_WRITE_MODE=sync to
+measure pooled synchronous commits. Run from the repo root:
+    python -m benchmarks.bench_db_pool
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from app.database.db_manager import DatabaseManager
+from app.database.models import DatabaseModels
+
+ORDER_COUNT = 1_000
+LOOKUPS = 5_000
+INSERTS = 1_000
+BATCH = 50
+
+
+def seed_orders(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(str(10000 + i), "Phone Stand", 299, "delivered", "UPI", "2025-08-20", "Mumbai") for i in range(ORDER_COUNT)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def baseline_get_order(db_path, order_id):
+    """The original implementation: open, query, close"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,))
+    order = cursor.fetchone()
+    conn.close()
+    return order
+
+
+def baseline_save_conversation(db_path, message):
+    """The original implementation: open, insert, commit, close"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO conversations (conversation_id, message, sender, language, rag_rat_context)
+        VALUES (?, ?, ?, ?, ?)
+    """, (str(uuid.uuid4()), message, "user", "en", "{}"))
+    conn.commit()
+    conn.close()
+
+
+def cold_lookup(manager, order_ids):
+    manager.orders.invalidate()
+    return manager.get_orders_by_ids(order_ids)
+
+
+def ops_per_second(fn, count):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(7)
+    order_ids = [str(10000 + rng.randrange(ORDER_COUNT)) for _ in range(LOOKUPS)]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_db = os.path.join(tmp, "baseline.db")
+        pooled_db = os.path.join(tmp, "pooled.db")
+        
+        # Baseline runs against a default rollback-journal database, as before
+        DatabaseModels(baseline_db).pool.close_all()
+        conn = sqlite3.connect(baseline_db)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        seed_orders(baseline_db)
+        
+        DatabaseModels(pooled_db)
+        seed_orders(pooled_db)
+        manager = DatabaseManager(pooled_db)
+        
+        results = [
+            ("get_order_by_id", "before",
+             ops_per_second(lambda i: baseline_get_order(baseline_db, order_ids[i]), LOOKUPS)),
+            ("get_order_by_id", "after",
+             ops_per_second(lambda i: manager.get_order_by_id(order_ids[i]), LOOKUPS)),
+            ("get_order_by_id (cold)", "after",
+             ops_per_second(lambda i: cold_lookup(manager, [order_ids[i]]), LOOKUPS)),
+            ("get_orders_by_ids (cold)", "after",
+             ops_per_second(lambda i: cold_lookup(manager, order_ids[i * BATCH:(i + 1) * BATCH]),
+                            LOOKUPS // BATCH) * BATCH),
+            ("save_conversation_with_rag_rat", "before",
+             ops_per_second(lambda i: baseline_save_conversation(baseline_db, f"message {i}"), INSERTS)),
+            ("save_conversation_with_rag_rat", "after",
+             ops_per_second(lambda i: manager.save_conversation_with_rag_rat(f"message {i}", "user", "en", {}), INSERTS)),
+        ]
+        manager.writer.flush()
+        manager.pool.close_all()
+    
+    print(f"{'operation':<32} {'variant':<8} {'ops/s':>10}")
+    for name, variant, rate in results:
+        print(f"{name:<32} {variant:<8} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark: per-classifier substring loops vs the single-pass keyword matcher.
+
+Classifies a synthetic corpus of support messages into every category (price,
+inappropriate, issue type, policy keywords). Run from the repo root:
+    python -m benchmarks.bench_keyword_matcher
+"""
+import random
+import time
+
+from app.tools.keyword_matcher import SUPPORT_KEYWORDS, SUPPORT_MATCHER
+
+CORPUS_SIZE = 100_000
+
+FRAGMENTS = [
+    "mera order", "nahi mila", "bhai", "the cover arrived", "cracked", "please help",
+    "iphone 14 cover", "ka price kya hai", "how much for", "power bank", "wrong item aaya",
+    "refund chahiye", "order id 45821", "kab tak aayega", "delivery boy", "was rude",
+    "screen protector", "toot gaya", "photo bhej diya", "return karna hai", "within 24 hours",
+    "tell me a joke", "kya haal hai", "missing items", "galat product", "thank you",
+]
+
+# The original hard-coded lists, checked the original way
+LEGACY_PRICE = ["price", "cost", "rate", "kitna hai", "how much", "kitne ka",
+                "kitne mein", "price kya hai", "rate kya hai", "cost kitna"]
+LEGACY_INAPPROPRIATE = ["dating", "relationship", "girlfriend", "boyfriend", "marriage",
+                        "politics", "religion", "sports", "movies", "celebrity",
+                        "sex", "adult", "xxx", "porn",
+                        "coding", "programming", "software development",
+                        "how are you", "what's your name", "where do you live", "tell me joke"]
+LEGACY_POLICY = [keyword.rstrip("*") for keyword in SUPPORT_KEYWORDS["policy"]]
+
+
+def legacy_classify(message):
+    result = {}
+    if any(keyword in message.lower() for keyword in LEGACY_PRICE):
+        result["price"] = True
+    query_lower = message.lower()
+    if any(keyword in query_lower for keyword in LEGACY_INAPPROPRIATE):
+        result["inappropriate"] = True
+    query_lower = message.lower()
+    if any(word in query_lower for word in ["damage", "broken", "crack", "kharab"]):
+        result["issue"] = "damage"
+    elif any(word in query_lower for word in ["nahi mila", "not received", "nahi aaya", "missing"]):
+        result["issue"] = "missing"
+    elif any(word in query_lower for word in ["wrong", "galat", "different", "alag"]):
+        result["issue"] = "wrong"
+    text_lower = message.lower()
+    result["policy"] = [keyword for keyword in LEGACY_POLICY if keyword in text_lower]
+    return result
+
+
+def synthetic_corpus(rng):
+    return [" ".join(rng.sample(FRAGMENTS, rng.randint(2, 6))) for _ in range(CORPUS_SIZE)]
+
+
+def main():
+    corpus = synthetic_corpus(random.Random(3))
+    
+    start = time.perf_counter()
+    for message in corpus:
+        legacy_classify(message)
+    legacy_s = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for message in corpus:
+        SUPPORT_MATCHER.match(message)
+    matcher_s = time.perf_counter() - start
+    
+    print(f"{CORPUS_SIZE} messages, all categories per message")
+    print(f"{'legacy substring loops':<26} {legacy_s * 1e6 / CORPUS_SIZE:>8.2f} us/msg")
+    print(f"{'single-pass matcher':<26} {matcher_s * 1e6 / CORPUS_SIZE:>8.2f} us/msg")
+    print(f"{'speedup':<26} {legacy_s / matcher_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
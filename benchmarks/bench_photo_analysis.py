@@ -0,0 +1,55 @@
+"""Benchmark: per-image damage-analysis latency at 1, 4 and 12 megapixels.
+
+Times PhotoAnalysisTools.analyze_damage_photo end to end (JPEG decode with
+draft(), grayscale, features, verdict). Run from the repo root:
+    python -m benchmarks.bench_photo_analysis
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.tools.photo_analysis import PhotoAnalysisTools
+
+SIZES = {1: (1152, 864), 4: (2304, 1728), 12: (4000, 3000)}
+REPEATS = 10
+
+
+def synthetic_photo(path, size, seed):
+    """Smooth shaded product with a few dark crack-like strokes"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    base = 128 + 60 * np.sin(x / (width / 6)) + 40 * np.cos(y / (height / 6))
+    base = np.clip(base + rng.normal(0, 4, base.shape), 0, 255).astype(np.uint8)
+    img = Image.fromarray(np.stack([base] * 3, axis=-1))
+    draw = ImageDraw.Draw(img)
+    for _ in range(20):
+        x0, y0 = rng.integers(0, width), rng.integers(0, height)
+        x1, y1 = x0 + rng.integers(-width // 4, width // 4), y0 + rng.integers(-height // 4, height // 4)
+        draw.line([(x0, y0), (x1, y1)], fill=(25, 25, 25), width=max(2, width // 400))
+    img.save(path, quality=90)
+
+
+def main():
+    tools = PhotoAnalysisTools()
+    
+    print(f"{'MP':>4} {'dimensions':>12} {'ms/image':>10} {'severity':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for megapixels, size in SIZES.items():
+            path = os.path.join(tmp, f"photo_{megapixels}mp.jpg")
+            synthetic_photo(path, size, seed=megapixels)
+            
+            result = tools.analyze_damage_photo(path)
+            start = time.perf_counter()
+            for _ in range(REPEATS):
+                tools.analyze_damage_photo(path)
+            per_image_ms = (time.perf_counter() - start) / REPEATS * 1000
+            
+            print(f"{megapixels:>4} {size[0]:>5}x{size[1]:<6} {per_image_ms:>10.1f} {result['analysis']['damage_severity']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""End-to-end turn benchmark: SupportAgents + PolicyReasoningSystem + DatabaseManager.
+
+Runs multi-turn conversations through the same steps as the Streamlit turn
+loop against benchmarks.fake_llm_server, so no Groq or Tavily access is
+needed. Reports per-stage latency (classify, price search, RAG, each RAT step,
+reply, DB write), p50/p95/p99 and throughput.
+
+Conversations come from the built-in script, or from a JSONL replay file.
+Each line can be {"turns": [...]}, or one message under "message", "text",
+"body" or "title". Lines that share a "session_id" or "conversation_id"
+form one conversation, so a requests.jsonl-style file replays as is.
+
+Run from the repo root:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --replay requests.jsonl --rat-mode fast --json run.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from app.tools.tracing import tracer, TraceSink
+
+SCRIPTED_CONVERSATIONS = [
+    ["Hi", "mera order toot gaya", "order id 48213 hai", "refund kab milega?"],
+    ["My order 55120 never arrived", "items are missing, not received", "what happens now?"],
+    ["iPhone 14 cover ka price kya hai", "ok thanks"],
+    ["who is your girlfriend", "sorry, my order 77341 came with the wrong item", "can I get a replacement?"],
+]
+
+STAGES = ("turn", "session_load", "classify", "price_search", "rag", "rat_analyze", "rat_reason",
+          "rat_decide", "rat_fast", "reply", "reply_ttft", "db_write", "session_save")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class StageTimer:
+    """Collects wall-clock samples per stage by wrapping methods on live objects"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def record(self, stage, seconds):
+        self.samples[stage].append(seconds * 1000)
+
+    def wrap(self, obj, method_name, stage):
+        method = getattr(obj, method_name)
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        setattr(obj, method_name, timed)
+
+    def wrap_generator(self, obj, method_name, stage):
+        """Time a generator method from the call until it is exhausted"""
+        method = getattr(obj, method_name)
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                yield from method(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        setattr(obj, method_name, timed)
+
+    def summary(self):
+        result = OrderedDict()
+        for stage in STAGES:
+            values = sorted(self.samples.get(stage, []))
+            if not values:
+                continue
+            result[stage] = {
+                "count": len(values),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(percentile(values, 50), 3),
+                "p95_ms": round(percentile(values, 95), 3),
+                "p99_ms": round(percentile(values, 99), 3),
+                "max_ms": round(values[-1], 3)
+            }
+        return result
+
+
+def load_replay(path):
+    """Group replay lines into conversations, preserving file order"""
+    conversations = OrderedDict()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "turns" in record:
+                turns = [str(turn) for turn in record["turns"]]
+            else:
+                text = next((record[key] for key in ("message", "text", "body", "title") if record.get(key)), None)
+                if text is None:
+                    continue
+                turns = [str(text)]
+            key = record.get("session_id") or record.get("conversation_id") or f"line-{line_number}"
+            conversations.setdefault(key, []).extend(turns)
+    return list(conversations.values())
+
+
+def configure_environment(server, args, db_dir):
+    """Point every outbound client at the fake server before the app objects are built"""
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    os.environ["GROQ_API_KEY"] = "fake-key"
+    os.environ["TAVILY_BASE_URL"] = f"{server.base_url}/search"
+    os.environ["TAVILY_API_KEY"] = "fake-key"
+    os.environ["RAT_MODE"] = args.rat_mode
+    os.environ["DB_WRITE_MODE"] = args.db_write_mode
+    os.environ["POLICY_WATCH_INTERVAL"] = "0"
+    if not args.decision_cache:
+        os.environ["DECISION_CACHE_SIZE"] = "0"
+    return os.path.join(db_dir, "bench_pipeline.db")
+
+
+def build_stack(db_path, timer):
+    from app.agents.cs_agents import SupportAgents
+    from app.database.db_manager import DatabaseManager
+    from app.database.models import DatabaseModels
+    from app.database.session_store import SQLiteSessionStore
+    from app.database.order_repository import get_order_repository
+
+    DatabaseModels(db_path)
+    agents = SupportAgents(session_store=SQLiteSessionStore(db_path),
+                           order_repository=get_order_repository(db_path))
+    db_manager = DatabaseManager(db_path)
+    tracer.add_sink(TraceSink(db_manager.writer))
+
+    rat_engine = agents.policy_system.rat_engine
+    timer.wrap(agents, "classify_and_handle_query", "classify")
+    timer.wrap(agents.tavily_mcp, "search_product_price", "price_search")
+    timer.wrap(agents.policy_system.rag_engine, "query_policy", "rag")
+    timer.wrap(rat_engine, "_analyze_situation", "rat_analyze")
+    timer.wrap(rat_engine, "_reason_through_policies", "rat_reason")
+    timer.wrap(rat_engine, "_make_final_decision", "rat_decide")
+    timer.wrap(rat_engine, "_think_fast", "rat_fast")
+    timer.wrap_generator(agents.llm_manager, "stream_support_response", "reply")
+    timer.wrap(db_manager, "save_conversation_with_rag_rat", "db_write")
+    timer.wrap(agents, "load_session", "session_load")
+    timer.wrap(agents, "save_turn", "session_save")
+    return agents, db_manager
+
+
+def run_conversation(agents, db_manager, timer, turns):
+    """One conversation through the same steps as the Streamlit turn loop"""
+    session_id = f"bench-{time.perf_counter_ns()}"
+
+    def log(role, content, state):
+        order_id = (state["current_order"] or {}).get("order_id")
+        db_manager.save_conversation_with_rag_rat(
+            content, role, None, {"issue_type": state["issue_type"]},
+            session_id=session_id, ticket_id=state["current_ticket"], order_id=order_id
+        )
+
+    for prompt in turns:
+        start = time.perf_counter()
+        with tracer.turn(session_id=session_id) as turn:
+            session = agents.load_session(session_id)
+            state = dict(session["state"])
+            user_message = {"role": "user", "content": prompt}
+            log("user", prompt, state)
+            history, summary = agents.conversation_context(session)
+            query_result = agents.prepare_turn(prompt, history + [user_message], state, summary)
+            turn.set(route=query_result.get("route") or query_result["type"])
+
+            if not query_result.get("needs_ai_response"):
+                reply = query_result["response"]
+            else:
+                stream_stats = {}
+                reply = "".join(agents.llm_manager.stream_support_response(query_result["prompt"], stats=stream_stats))
+                if stream_stats.get("ttft_ms") is not None:
+                    timer.record("reply_ttft", stream_stats["ttft_ms"] / 1000)
+
+            log("assistant", reply, state)
+            agents.save_turn(session, state, [user_message, {"role": "assistant", "content": reply}])
+        timer.record("turn", time.perf_counter() - start)
+
+
+def print_report(report):
+    print(f"{report['turns']} turns in {report['conversations']} conversations, "
+          f"{report['wall_s']:.2f} s, {report['throughput_turns_per_s']:.2f} turns/s")
+    print(f"{'stage':<14}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<14}{stats['count']:>7}" + "".join(
+            f"{stats[key]:>10.1f}" for key in ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+        ))
+    print("fast-path routes:", {route: s["hits"] for route, s in report["fast_path"].items()})
+    print("fake server requests:", report["server_requests"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", help="JSONL file of conversations to replay instead of the built-in script")
+    parser.add_argument("--repeat", type=int, default=5, help="times to run the conversation set")
+    parser.add_argument("--latency-ms", type=float, default=200, help="fake server time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=200, help="fake server token rate")
+    parser.add_argument("--reply-tokens", type=int, default=40, help="tokens per fake completion")
+    parser.add_argument("--rat-mode", choices=("deep", "fast"), default="deep")
+    parser.add_argument("--db-write-mode", choices=("async", "sync"), default="async")
+    parser.add_argument("--no-decision-cache", dest="decision_cache", action="store_false",
+                        help="disable the RAT decision cache so every policy turn reasons")
+    parser.add_argument("--metrics", action="store_true", help="also print the Prometheus metrics text")
+    parser.add_argument("--json", help="write the full report to this path")
+    args = parser.parse_args()
+
+    conversations = load_replay(args.replay) if args.replay else SCRIPTED_CONVERSATIONS
+    server = FakeLLMServer(args.latency_ms, args.tokens_per_s, args.reply_tokens).start()
+    timer = StageTimer()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        db_path = configure_environment(server, args, db_dir)
+        agents, db_manager = build_stack(db_path, timer)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for turns in conversations:
+                run_conversation(agents, db_manager, timer, turns)
+        wall_s = time.perf_counter() - start
+
+        db_manager.writer.flush()
+        db_manager.pool.close_all()
+    server.stop()
+
+    turns = len(timer.samples["turn"])
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "metrics")},
+        "conversations": len(conversations) * args.repeat,
+        "turns": turns,
+        "wall_s": round(wall_s, 3),
+        "throughput_turns_per_s": round(turns / wall_s, 3) if wall_s else None,
+        "stages": timer.summary(),
+        "fast_path": agents.fast_path.stats(),
+        "decision_cache": agents.policy_system.decision_cache.stats(),
+        "server_requests": dict(server.requests)
+    }
+    print_report(report)
+    if args.metrics:
+        print(tracer.registry.render())
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
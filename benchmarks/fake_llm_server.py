@@ -0,0 +1,186 @@
+"""Local stand-in for the Groq (OpenAI-compatible) and Tavily HTTP APIs.
+
+Serves POST /openai/v1/chat/completions, both plain and streamed as SSE, and
+POST /search. Every reply waits latency_ms before the first token, then
+emits tokens at tokens_per_s. JSON-mode requests get a valid RAT decision
+object. Point the app at it with GROQ_BASE_URL and TAVILY_BASE_URL.
+
+Standalone:
+    python -m benchmarks.fake_llm_server --port 8900 --latency-ms 300 --tokens-per-s 150
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY_WORDS = (
+    "Sorry for the trouble with your order. As per policy this case qualifies, so we will "
+    "process refund with high confidence and share the update on your registered number soon."
+).split()
+
+FAST_DECISION = {
+    "situation_analysis": "Damaged item reported within the claim window with order details available.",
+    "policy_reasoning": "Damage policy applies; evidence and timing conditions are met, no exceptions.",
+    "decision": {
+        "recommendation": "process_refund",
+        "confidence": "high",
+        "reasoning": "Eligible damage claim inside the policy window; refund to original payment method."
+    }
+}
+
+PRICE_ANSWER = "Current price on Swiggy Instamart is around ₹299, varying slightly by city and offers."
+
+
+class FakeLLMServer:
+    """Threaded HTTP server with configurable time to first token and token rate"""
+
+    def __init__(self, latency_ms=200, tokens_per_s=200, reply_tokens=40, host="127.0.0.1", port=0):
+        self.latency_ms = latency_ms
+        self.tokens_per_s = tokens_per_s
+        self.reply_tokens = reply_tokens
+        self.requests = {"chat": 0, "chat_stream": 0, "search": 0}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, key):
+        with self._lock:
+            self.requests[key] += 1
+
+    def reply_text(self, max_tokens):
+        count = min(self.reply_tokens, max_tokens or self.reply_tokens)
+        return " ".join(REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(count))
+
+    def token_delay(self):
+        return 1.0 / self.tokens_per_s if self.tokens_per_s else 0.0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if self.path.rstrip("/").endswith("/chat/completions"):
+                    if body.get("stream"):
+                        self._stream_completion(body)
+                    else:
+                        self._completion(body)
+                elif self.path.rstrip("/").endswith("/search"):
+                    server._count("search")
+                    time.sleep(server.latency_ms / 1000)
+                    self._send_json({"answer": PRICE_ANSWER, "results": []})
+                else:
+                    self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _completion(self, body):
+                server._count("chat")
+                if (body.get("response_format") or {}).get("type") == "json_object":
+                    content = json.dumps(FAST_DECISION)
+                else:
+                    content = server.reply_text(body.get("max_tokens"))
+                completion_tokens = len(content.split())
+                time.sleep(server.latency_ms / 1000 + completion_tokens * server.token_delay())
+                self._send_json({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": sum(len(m.get("content", "").split()) for m in body.get("messages", [])),
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": completion_tokens
+                    }
+                })
+
+            def _stream_completion(self, body):
+                server._count("chat_stream")
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                time.sleep(server.latency_ms / 1000)
+                words = server.reply_text(body.get("max_tokens")).split()
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(server.token_delay())
+                    self._send_event({
+                        "id": chunk_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model"),
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": word if i == 0 else " " + word},
+                            "finish_reason": None
+                        }]
+                    })
+                self._send_chunk(b"data: [DONE]\n\n")
+                self._send_chunk(b"")
+
+            def _send_event(self, payload):
+                self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+            def _send_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--tokens-per-s", type=float, default=200)
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.latency_ms, args.tokens_per_s, args.reply_tokens, args.host, args.port)
+    print(f"Fake LLM server on {server.base_url} (GROQ_BASE_URL={server.base_url}, "
+          f"TAVILY_BASE_URL={server.base_url}/search)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 import streamlit as st
+import os
 import time
+import uuid
 from app.database.models import DatabaseModels
+from app.database.db_manager import DatabaseManager
 from app.agents.cs_agents import SupportAgents
-from app.tools.rag_tools import PolicyReasoningSystem
 from app.tools.database_tools import DatabaseTools
-from app.tools.photo_analysis import PhotoAnalysisTools
+from app.tools.photo_analysis import PhotoAnalysisTools, start_photo_pool
+from app.tools.tracing import tracer, TraceSink, start_metrics_server
+from app.api.client import SupportAPIClient
 
 # Page config
 st.set_page_config(page_title="Swiggy Support", page_icon="🛟", layout="wide")
 
+# When set, turns run on the app.api.server service and this app only renders them
+SUPPORT_API_URL = os.getenv("SUPPORT_API_URL")
+
+@st.cache_resource
+def init_api_client():
+    return SupportAPIClient(SUPPORT_API_URL)
+
 @st.cache_resource
 def init_components():
     try:
@@ -16,37 +27,247 @@ def init_components():
         support_agents = SupportAgents()
         db_tools = DatabaseTools()
         photo_tools = PhotoAnalysisTools()
-        return db_models, support_agents, db_tools, photo_tools
+        db_manager = DatabaseManager()
+        
+        # Per-turn traces go to turn_traces; METRICS_PORT exposes /metrics
+        tracer.add_sink(TraceSink(db_manager.writer))
+        tracer.registry.register_gauge(
+            "support_fast_path_hits", lambda: {(("route", route),): stats["hits"] for route, stats in support_agents.fast_path.stats().items()},
+            "Turns per fast-path route (llm = model fallback)"
+        )
+        tracer.registry.register_gauge(
+            "support_db_write_pending", db_manager.writer.pending, "Rows queued but not yet committed"
+        )
+        tracer.registry.register_gauge(
+            "support_session_cache", lambda: {(("stat", key),): value for key, value in support_agents.session_store.cache.stats().items()},
+            "Session store read-through cache counters"
+        )
+        tracer.registry.register_gauge(
+            "support_order_cache", lambda: {(("stat", key),): value for key, value in support_agents.order_repository.cache.stats().items()},
+            "Order repository cache counters"
+        )
+        start_metrics_server()
+        start_photo_pool()
+        return db_models, support_agents, db_tools, photo_tools, db_manager
     except Exception as e:
         st.error(f"Init error: {str(e)}")
-        return None, None, None, None
+        return None, None, None, None, None
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
     st.session_state.current_order = None
     st.session_state.current_ticket = None
     st.session_state.awaiting_photo = False
+    st.session_state.photo_received = False
     st.session_state.issue_type = None
     st.session_state.first_interaction = True
+    st.session_state.session_id = str(uuid.uuid4())
+    st.session_state.spilled_messages = 0
+    st.session_state.older_page = None
+
+# Only this many messages stay in session memory and get re-rendered; older ones are
+# read back from the conversation log a page at a time
+MESSAGE_TAIL = int(os.getenv("UI_MESSAGE_TAIL", "30"))
+HISTORY_PAGE_SIZE = int(os.getenv("UI_HISTORY_PAGE_SIZE", "20"))
 
-def add_message_with_delay(content, delay=1.5):
-    """Add message with natural typing delay"""
-    if len(st.session_state.messages) > 1:
-        time.sleep(delay)
+# Cosmetic typing effect for canned messages; off by default so nothing waits on sleeps
+TYPING_EFFECT = os.getenv("SUPPORT_TYPING_EFFECT", "0") == "1"
+TYPING_WORD_DELAY = 0.03
+
+def render_assistant_stream(chunks, server_logged=False):
+    """Render tokens into one assistant bubble as they arrive, then keep the full text"""
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        content = ""
+        for chunk in chunks:
+            content += chunk
+            placeholder.markdown(content + "▌")
+        placeholder.markdown(content)
     
-    st.session_state.messages.append({"role": "assistant", "content": content})
+    add_message("assistant", content, server_logged)
+    return content
+
+def add_message(role, content, server_logged=False):
+    """Append to the on-screen history and log it against this session
+
+    In API mode nothing is logged here; server_logged says whether the service
+    logged this message itself (turn and photo messages, not the greeting or
+    local error notes). Each message records whether it is in the log, so
+    paging back starts right after the last logged message still on screen.
+    """
+    st.session_state.messages.append({"role": role, "content": content,
+                                      "logged": server_logged if SUPPORT_API_URL else True})
+    overflow = len(st.session_state.messages) - MESSAGE_TAIL
+    if overflow > 0:
+        # Already in the conversation log, so dropping them here loses nothing
+        del st.session_state.messages[:overflow]
+        st.session_state.spilled_messages += overflow
     
-    with st.chat_message("assistant"):
-        st.markdown(content)
+    # The API service logs its own turns
+    db_manager = None if SUPPORT_API_URL else init_components()[4]
+    if db_manager:
+        current_order = st.session_state.current_order or {}
+        db_manager.save_conversation_with_rag_rat(
+            content,
+            role,
+            None,
+            {"issue_type": st.session_state.issue_type},
+            session_id=st.session_state.session_id,
+            ticket_id=st.session_state.current_ticket,
+            order_id=current_order.get("order_id")
+        )
 
-def main():
-    st.title("🛟 Swiggy Support")
-    components = init_components()
-    if not all(components):
-        st.error("System initialization failed")
+def fetch_history(before, limit):
+    """One page of this session's logged messages, from the API service or the local database"""
+    if SUPPORT_API_URL:
+        return init_api_client().get_history(st.session_state.session_id, before, limit)
+    return init_components()[4].get_history(st.session_state.session_id, before=before, limit=limit)
+
+def load_older_page(cursor=None):
+    """Show the page of messages just before cursor, or just before the on-screen tail"""
+    if cursor is None:
+        # Step over the logged messages still in memory to find where the spilled ones end
+        on_screen = sum(1 for message in st.session_state.messages if message.get("logged", True))
+        if not on_screen:
+            st.session_state.older_page = fetch_history(None, HISTORY_PAGE_SIZE)
+            return
+        cursor = fetch_history(None, on_screen)["next_before"]
+    if not cursor:
+        st.session_state.older_page = {"messages": [], "next_before": None, "has_more": False}
+        return
+    st.session_state.older_page = fetch_history(cursor, HISTORY_PAGE_SIZE)
+
+def render_older_messages():
+    """Earlier messages, one page at a time, so the rerender cost stays bounded"""
+    page = st.session_state.older_page
+    if not st.session_state.spilled_messages and page is None:
         return
     
-    db_models, support_agents, db_tools, photo_tools = components
+    if page is None:
+        if st.button(f"Show earlier messages ({st.session_state.spilled_messages})"):
+            load_older_page()
+            st.rerun()
+        return
+    
+    with st.expander("Earlier messages", expanded=True):
+        for message in page["messages"]:
+            with st.chat_message(message["sender"]):
+                st.markdown(message["message"])
+        
+        older_col, hide_col = st.columns(2)
+        if page["has_more"] and older_col.button("Older"):
+            load_older_page(page["next_before"])
+            st.rerun()
+        if hide_col.button("Hide"):
+            st.session_state.older_page = None
+            st.rerun()
+
+def typed_words(content):
+    """Reveal a canned message word by word"""
+    for i, word in enumerate(content.split(" ")):
+        if i:
+            time.sleep(TYPING_WORD_DELAY)
+        yield word if i == 0 else " " + word
+
+def add_assistant_message(content, server_logged=False):
+    """Add a canned assistant message, optionally with the typing effect"""
+    return render_assistant_stream(typed_words(content) if TYPING_EFFECT else [content], server_logged)
+
+def apply_turn_state(state):
+    """Mirror the stored session state into the page state the UI renders from"""
+    for key, value in state.items():
+        st.session_state[key] = value
+
+def handle_turn_locally(support_agents, prompt):
+    """Run the turn in-process against the shared session store"""
+    session = support_agents.load_session(st.session_state.session_id)
+    state = dict(session["state"])
+    user_message = {"role": "user", "content": prompt}
+    history, summary = support_agents.conversation_context(session)
+    query_result = support_agents.prepare_turn(prompt, history + [user_message], state, summary)
+    apply_turn_state(state)
+    tracer.current_turn().set(route=query_result.get("route") or query_result["type"])
+    
+    if not query_result.get("needs_ai_response"):
+        reply = add_assistant_message(query_result["response"])
+    else:
+        stream_stats = {}
+        reply = render_assistant_stream(
+            support_agents.llm_manager.stream_support_response(query_result["prompt"], stats=stream_stats)
+        )
+        if stream_stats.get("ttft_ms") is not None:
+            st.session_state.last_ttft_ms = stream_stats["ttft_ms"]
+            print(f"Reply TTFT {stream_stats['ttft_ms']:.0f} ms, total {stream_stats['total_ms']:.0f} ms")
+        prompt_stats = query_result.get("prompt_stats")
+        if prompt_stats:
+            print(f"Reply prompt {prompt_stats['input_tokens']} tokens "
+                  f"(saved {prompt_stats['saved_tokens']} of {prompt_stats['baseline_tokens']})")
+    
+    session = support_agents.save_turn(session, state, [user_message, {"role": "assistant", "content": reply}])
+    apply_turn_state(session["state"])
+
+def handle_turn_remotely(api_client, prompt):
+    """Stream the turn from the API service; the done event carries the updated session state"""
+    done = {}
+    failed = {}
+    
+    def tokens():
+        for event in api_client.stream_turn(st.session_state.session_id, prompt):
+            if event["event"] == "token":
+                yield event["text"]
+            elif event["event"] == "done":
+                done.update(event)
+            elif event["event"] == "error":
+                failed.update(event)
+    
+    render_assistant_stream(tokens(), server_logged=True)
+    if failed:
+        raise RuntimeError(failed["error"])
+    if done:
+        apply_turn_state(done["state"])
+
+def handle_photos_locally(components, uploaded_files):
+    """Validate, analyze and resolve a photo claim in-process; returns upload errors"""
+    db_models, support_agents, db_tools, photo_tools, db_manager = components
+    errors = []
+    for uploaded_file in uploaded_files:
+        validation = photo_tools.validate_photo_upload(uploaded_file)
+        errors += [f"{uploaded_file.name}: {error}" for error in validation["errors"]]
+    if errors:
+        return errors
+    
+    with tracer.turn(session_id=st.session_state.session_id, route="photo_upload"):
+        session = support_agents.load_session(st.session_state.session_id)
+        state = dict(session["state"])
+        claim = photo_tools.analyze_uploaded_claim(db_tools, uploaded_files, state["current_ticket"])
+        messages = support_agents.resolve_photo_claim(claim, state)
+        apply_turn_state(state)
+        for message in messages:
+            add_assistant_message(message)
+        session = support_agents.save_turn(session, state, [{"role": "assistant", "content": message} for message in messages])
+        apply_turn_state(session["state"])
+    return []
+
+def handle_photos_remotely(api_client, uploaded_files):
+    """Same as handle_photos_locally, on the API service"""
+    result = api_client.upload_photos(st.session_state.session_id, uploaded_files)
+    if result.get("errors"):
+        return result["errors"]
+    for message in result["messages"]:
+        add_assistant_message(message, server_logged=True)
+    apply_turn_state(result["state"])
+    return []
+
+def main():
+    st.title("🛟 Swiggy Support")
+    if SUPPORT_API_URL:
+        api_client = init_api_client()
+    else:
+        components = init_components()
+        if not all(components):
+            st.error("System initialization failed")
+            return
+        support_agents = components[1]
     
     # # Sidebar
     # with st.sidebar:
@@ -72,119 +293,53 @@ def main():
     #         st.write(f"**Photo Required:** {'Yes' if st.session_state.awaiting_photo else 'No'}")
     
     if st.session_state.first_interaction:
-        st.session_state.messages.append({
-            "role": "assistant", 
-            "content": "Hi! Swiggy support se baat kar rahe ho. Kya problem hai?"
-        })
+        add_message("assistant", "Hi! Swiggy support se baat kar rahe ho. Kya problem hai?")
         st.session_state.first_interaction = False
     
+    render_older_messages()
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
     if st.session_state.awaiting_photo:
-        st.info("Please upload a clear photo of the damaged item")
-        uploaded_file = st.file_uploader(
-            "Upload damage photo", 
+        st.info("Please upload clear photos of the damaged item")
+        uploaded_files = st.file_uploader(
+            "Upload damage photos", 
             type=['jpg', 'jpeg', 'png', 'webp'],
-            help="Max file size: 10MB"
+            accept_multiple_files=True,
+            help="Max file size: 10MB per photo"
         )
         
-        if uploaded_file:
-            validation = photo_tools.validate_photo_upload(uploaded_file)
+        if uploaded_files and st.button("Submit photos"):
+            with st.spinner("Processing your photos..."):
+                if SUPPORT_API_URL:
+                    errors = handle_photos_remotely(api_client, uploaded_files)
+                else:
+                    errors = handle_photos_locally(components, uploaded_files)
             
-            if not validation["valid"]:
-                st.error(f"Upload error: {', '.join(validation['errors'])}")
+            if errors:
+                st.error(f"Upload error: {', '.join(errors)}")
             else:
-                with st.spinner("Processing your photo..."):
-                    save_result = db_tools.save_uploaded_photo(uploaded_file, st.session_state.current_ticket)
-                    
-                    if save_result["success"]:
-                        analysis_result = photo_tools.analyze_damage_photo(save_result["file_path"])
-                        
-                        if analysis_result["success"]:
-                            analysis = analysis_result["analysis"]
-                            
-                            photo_msg = "Photo mil gaya! Analysis kar raha hun..."
-                            add_message_with_delay(photo_msg)
-                            
-                            if analysis["damage_detected"]:
-                                damage_msg = f"Damage confirm ho gaya - {analysis['damage_severity']} level. Policy check kar raha hun..."
-                                add_message_with_delay(damage_msg, 2.5)
-                                
-                                policy_decision = support_agents.get_policy_decision_with_reasoning(
-                                    "damage",
-                                    st.session_state.current_order,
-                                    f"photo damage {analysis['damage_severity']}"
-                                )
-                                
-                                if policy_decision["recommendation"] == "process_refund":
-                                    resolution_msg = f"Policy ke according full refund approve ho gaya! ₹{st.session_state.current_order['amount']} refund process kar raha hun. 2-3 days mein account mein aa jayega."
-                                elif policy_decision["recommendation"] == "offer_replacement":
-                                    resolution_msg = "Replacement arrange kar raha hun. Same day delivery hoga!"
-                                else:
-                                    resolution_msg = "Admin approval leke solution dunga. Wait karo please."
-                                
-                                add_message_with_delay(resolution_msg, 3.0)
-                            else:
-                                no_damage_msg = "Photo mein clear damage nahi dikh raha, but customer satisfaction important hai. Replacement arrange kar raha hun."
-                                add_message_with_delay(no_damage_msg, 2.0)
-                        
-                        st.session_state.awaiting_photo = False
-                        st.rerun()
+                st.rerun()
     
     if prompt := st.chat_input("Type your message..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        add_message("user", prompt, server_logged=True)
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        with st.spinner("Thinking..."):
+        with st.spinner("Thinking..."), tracer.turn(session_id=st.session_state.session_id) as turn:
             try:
-                query_result = support_agents.classify_and_handle_query(
-                    prompt,
-                    st.session_state.messages,
-                    {
-                        "current_order": st.session_state.current_order,
-                        "issue_type": st.session_state.issue_type,
-                        "current_ticket": st.session_state.current_ticket
-                    }
-                )
-                
-                if query_result.get("needs_ai_response"):
-                    response = support_agents.get_ai_response_with_context(
-                        query_result,
-                        prompt,
-                        st.session_state.messages,
-                        {
-                            "current_order": st.session_state.current_order,
-                            "issue_type": st.session_state.issue_type,
-                            "current_ticket": st.session_state.current_ticket
-                        }
-                    )
-                    
-                    add_message_with_delay(response)
-                    
-                    order_id = support_agents.extract_order_id(prompt)
-                    if order_id and not st.session_state.current_order:
-                        st.session_state.current_order = support_agents.generate_order_data(order_id)
-                        st.session_state.current_ticket = f"TKT{order_id}"
-                    
-                    detected_issue = support_agents.detect_issue_type(prompt, st.session_state.messages)
-                    if detected_issue:
-                        st.session_state.issue_type = detected_issue
-                    
-                    if (st.session_state.issue_type == "damage" and 
-                        st.session_state.current_order and 
-                        not st.session_state.awaiting_photo):
-                        photo_request = "Damage ki photo share karo please, main verify kar ke solution dunga!"
-                        add_message_with_delay(photo_request, 2.0)
-                        st.session_state.awaiting_photo = True
+                if SUPPORT_API_URL:
+                    handle_turn_remotely(api_client, prompt)
+                else:
+                    handle_turn_locally(support_agents, prompt)
                 
                 st.rerun()
                 
             except Exception as e:
+                turn.error = f"{type(e).__name__}: {e}"
                 error_msg = "Technical problem aa gayi! Main help kar raha hun."
-                add_message_with_delay(error_msg)
+                add_assistant_message(error_msg)
                 st.error(f"Error: {str(e)}")
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pytest
+
+from app.tools.rag_tools import PolicyReasoningSystem
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+DECISION = {
+    "situation_analysis": "Damaged cover reported the day after delivery for order 10001",
+    "policy_reasoning": "Within the return window, photo evidence provided",
+    "decision": {
+        "recommendation": "offer_replacement",
+        "confidence": "high",
+        "reasoning": "Replace order 10001 since the customer said the cover arrived cracked"
+    }
+}
+
+
+class StubLLM:
+    """Answers the fast RAT call with a fixed decision, or nothing when offline"""
+
+    def __init__(self):
+        self.calls = 0
+        self.offline = False
+
+    def get_structured_analysis(self, prompt, max_tokens=None):
+        self.calls += 1
+        return None if self.offline else DECISION
+
+
+@pytest.fixture
+def system(monkeypatch):
+    # Policy files are read relative to the repository root
+    monkeypatch.chdir(REPO_ROOT)
+    llm = StubLLM()
+    system = PolicyReasoningSystem(llm, policy_watch_interval=0)
+    system.llm = llm
+    return system
+
+
+def order(order_id):
+    return {"order_id": order_id, "status": "delivered", "payment_method": "UPI"}
+
+
+def decide(system, order_data, query="my phone cover arrived cracked"):
+    return system.process_policy_query("damage", order_data, query, reasoning_mode="fast")
+
+
+def test_equivalent_case_reuses_the_decision(system):
+    first = decide(system, order("10001"))
+    second = decide(system, order("20002"))
+
+    assert first["decision_cache"] == "miss"
+    assert second["decision_cache"] == "hit"
+    assert system.llm.calls == 1
+    assert second["recommendation"] == "offer_replacement"
+    assert second["confidence"] == "high"
+    assert second["thinking_process"] is None
+
+
+def test_cache_holds_only_the_case_level_decision(system):
+    query = "my phone cover arrived cracked"
+    decide(system, order("10001"), query)
+
+    rag_result = system.rag_engine.query_policy(query, "damage", n_results=3)
+    cached = system.decision_cache.get(system._decision_cache_key("damage", order("10001"), rag_result, "fast"))
+    assert cached == {"recommendation": "offer_replacement", "confidence": "high", "degraded": False}
+
+
+def test_hit_reasoning_is_written_for_the_current_order(system):
+    decide(system, order("10001"))
+    second = decide(system, order("20002"))
+
+    assert "20002" in second["reasoning"]
+    assert "10001" not in second["reasoning"]
+    assert "cracked" not in second["reasoning"]
+
+
+def test_degraded_decision_is_not_cached(system):
+    system.llm.offline = True
+    first = decide(system, order("10001"))
+    assert first["decision_cache"] == "degraded"
+    assert len(system.decision_cache) == 0
+
+    system.llm.offline = False
+    second = decide(system, order("10001"))
+    assert second["decision_cache"] == "miss"
+    assert second["recommendation"] == "offer_replacement"
+    assert system.llm.calls == 2
@@ -0,0 +1,45 @@
+from app.agents.fast_path import FAST_PATH_REPLIES, FastPathRouter, detect_language
+from app.tools.keyword_matcher import SUPPORT_MATCHER
+
+
+def route(text, **state):
+    return FastPathRouter().route(text, SUPPORT_MATCHER.match(text), state)
+
+
+def test_off_topic_turn_is_refused():
+    assert route("tell me a joke") == ("inappropriate", FAST_PATH_REPLIES["inappropriate"]["en"])
+
+
+def test_off_topic_word_in_a_complaint_is_not_refused():
+    assert route("my sports shoes arrived damaged") is None
+    assert route("the movie poster from order 123456 never came") is None
+
+
+def test_support_routes_follow_session_state():
+    assert route("my cover is broken", issue_type="damage")[0] == "order_id_needed"
+    assert route("it is broken", issue_type="damage", current_order={"order_id": "10001"})[0] == "photo_request"
+    assert route("ok uploading", awaiting_photo=True)[0] == "photo_pending"
+    assert route("how long will it take?", awaiting_photo=True) is None
+
+
+def test_price_questions_go_to_the_model():
+    assert route("price kya hai", issue_type="damage") is None
+
+
+def test_english_homographs_do_not_switch_to_hindi():
+    assert detect_language("he said it would arrive") == "en"
+    assert detect_language("h") == "en"
+    assert detect_language("Did I mile it up?") == "en"
+
+
+def test_romanized_hindi_and_devanagari_reply_in_hindi():
+    assert detect_language("mera order nahi mila") == "hi"
+    assert detect_language("ऑर्डर नहीं मिला") == "hi"
+
+
+def test_stats_count_llm_fallbacks():
+    router = FastPathRouter()
+    router.route("tell me a joke", SUPPORT_MATCHER.match("tell me a joke"), {})
+    router.route("what is the policy?", SUPPORT_MATCHER.match("what is the policy?"), {})
+
+    assert router.stats() == {"inappropriate": {"hits": 1, "rate": 0.5}, "llm": {"hits": 1, "rate": 0.5}}
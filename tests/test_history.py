@@ -0,0 +1,33 @@
+import pytest
+
+from app.database.db_manager import DatabaseManager
+from app.database.models import DatabaseModels
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    DatabaseModels(db_path)
+    db_manager = DatabaseManager(db_path)
+    for i in range(5):
+        db_manager.save_conversation_with_rag_rat(f"message {i}", "user", "en", {}, session_id="s1")
+    db_manager.save_conversation_with_rag_rat("other session", "user", "en", {}, session_id="s2")
+    return db_manager
+
+
+def test_pages_walk_back_through_the_session(db_manager):
+    newest = db_manager.get_history("s1", limit=2)
+    assert [m["message"] for m in newest["messages"]] == ["message 3", "message 4"]
+    assert newest["has_more"]
+
+    middle = db_manager.get_history("s1", before=newest["next_before"], limit=2)
+    oldest = db_manager.get_history("s1", before=middle["next_before"], limit=2)
+    assert [m["message"] for m in middle["messages"]] == ["message 1", "message 2"]
+    assert [m["message"] for m in oldest["messages"]] == ["message 0"]
+    assert not oldest["has_more"] and oldest["next_before"] is None
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "2025-08-20 10:00:00|", "|12", "2025-08-20 10:00:00|abc"])
+def test_malformed_cursor_raises_value_error(db_manager, cursor):
+    with pytest.raises(ValueError, match="Invalid history cursor"):
+        db_manager.get_history("s1", before=cursor)
@@ -0,0 +1,33 @@
+import pytest
+
+from app.tools.keyword_matcher import SUPPORT_MATCHER, KeywordMatcher
+
+
+def test_categories_and_keywords_in_order_of_first_appearance():
+    matched = SUPPORT_MATCHER.match("The cover arrived cracked and I want a refund")
+
+    assert list(matched) == ["issue_damage", "policy"]
+    assert matched["policy"] == ["crack", "refund"]
+
+
+def test_longest_phrase_wins():
+    assert SUPPORT_MATCHER.match("Price kya hai?")["price"][0] == "price kya hai"
+
+
+def test_multi_word_keywords_match_across_any_whitespace():
+    assert SUPPORT_MATCHER.match("it was   not\treceived")["issue_missing"] == ["not received"]
+
+
+def test_hinglish_spellings_match_their_keyword():
+    assert SUPPORT_MATCHER.match("mera order nahin mili")["issue_missing"] == ["nahi mila"]
+
+
+def test_stems_accept_suffixes_but_not_partial_words():
+    assert SUPPORT_MATCHER.match("my order was refunded") == {"policy": ["refund"]}
+    assert SUPPORT_MATCHER.match("please proceed") == {}
+    assert not SUPPORT_MATCHER.matches("no ratings yet", "price")
+
+
+def test_short_stem_keywords_are_rejected():
+    with pytest.raises(ValueError):
+        KeywordMatcher({"price": ["pr*"]})
@@ -0,0 +1,67 @@
+import pytest
+
+from app.database.models import DatabaseModels
+from app.database.order_repository import OrderRepository, synthetic_order
+
+
+@pytest.fixture
+def repository(tmp_path):
+    db_path = str(tmp_path / "orders.db")
+    DatabaseModels(db_path)
+    repository = OrderRepository(db_path, cache_ttl=300)
+    with repository.pool.transaction() as conn:
+        conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            ("10001", "Phone Stand", 299, "delivered", "UPI", "2025-08-20", "Mumbai"),
+            ("10002", "Power Bank 10000mAh", 899, "in_transit", "Card", "2025-08-22", "Delhi"),
+        ])
+    return repository
+
+
+def test_get_orders_mixes_table_rows_and_synthetic_orders(repository):
+    orders = repository.get_orders(["10001", 10002, "99999", "10001"])
+
+    assert list(orders) == ["10001", "10002", "99999"]
+    assert orders["10001"]["product_name"] == "Phone Stand"
+    assert orders["10002"]["amount"] == 899
+    assert orders["99999"] == synthetic_order("99999")
+
+
+def test_synthetic_orders_are_deterministic():
+    assert synthetic_order("4242") == synthetic_order("4242")
+    assert synthetic_order("4242") != synthetic_order("4243")
+
+
+def test_repeat_lookups_come_from_the_cache(repository):
+    repository.get_order("10001")
+    repository.get_order("55555")
+    hits = repository.cache.hits
+
+    repository.get_orders(["10001", "55555"])
+    assert repository.cache.hits == hits + 2
+
+
+def test_returned_orders_do_not_alias_the_cache(repository):
+    repository.get_order("10001")["status"] = "refunded"
+    assert repository.get_order("10001")["status"] == "delivered"
+
+
+def test_failed_lookup_is_not_cached(repository):
+    with repository.pool.transaction() as conn:
+        conn.execute("ALTER TABLE orders RENAME TO orders_offline")
+
+    assert repository.get_order("10001") == synthetic_order("10001")
+    assert len(repository.cache) == 0
+
+    with repository.pool.transaction() as conn:
+        conn.execute("ALTER TABLE orders_offline RENAME TO orders")
+    assert repository.get_order("10001")["product_name"] == "Phone Stand"
+
+
+def test_invalidate_rereads_changed_orders(repository):
+    repository.get_order("10001")
+    with repository.pool.transaction() as conn:
+        conn.execute("UPDATE orders SET status = 'refunded' WHERE order_id = '10001'")
+
+    assert repository.get_order("10001")["status"] == "delivered"
+    repository.invalidate("10001")
+    assert repository.get_order("10001")["status"] == "refunded"
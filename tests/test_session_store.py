@@ -0,0 +1,100 @@
+import pytest
+
+from app.database.session_store import SQLiteSessionStore, SessionConflictError
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def two_workers(db_path):
+    """Two stores on one database, like two API worker processes"""
+    return SQLiteSessionStore(db_path, cache_ttl=300), SQLiteSessionStore(db_path, cache_ttl=300)
+
+
+def test_conflict_retry_reapplies_changes_on_latest_version(db_path):
+    worker_a, worker_b = two_workers(db_path)
+    worker_a.save(worker_a.load("s1"))
+    stale = worker_a.load("s1")
+
+    other = worker_b.load("s1")
+    other["state"]["issue_type"] = "damage"
+    worker_b.save(other)
+
+    calls = []
+
+    def apply_changes(session):
+        calls.append(session["version"])
+        session["messages"].append({"role": "user", "content": "hello"})
+
+    saved = worker_a.update("s1", apply_changes, session=stale)
+
+    assert calls == [1, 2]
+    assert saved["version"] == 3
+    assert saved["state"]["issue_type"] == "damage"
+    assert saved["messages"] == [{"role": "user", "content": "hello"}]
+    assert worker_b.load("s1")["messages"] == saved["messages"]
+
+
+def test_update_gives_up_after_retries(db_path):
+    worker_a, worker_b = two_workers(db_path)
+    worker_a.save(worker_a.load("s1"))
+
+    def apply_changes(session):
+        # Another worker saves in between every attempt
+        competing = worker_b.load("s1")
+        worker_b.save(competing)
+
+    with pytest.raises(SessionConflictError):
+        worker_a.update("s1", apply_changes, session=worker_a.load("s1"), retries=2)
+
+
+def test_stale_cached_copy_is_reread_on_load(db_path):
+    worker_a, worker_b = two_workers(db_path)
+    worker_a.save(worker_a.load("s1"))
+    assert worker_a.load("s1")["version"] == 1
+
+    newer = worker_b.load("s1")
+    newer["state"]["current_order"] = {"order_id": "12345"}
+    worker_b.save(newer)
+
+    # Repeat reads within a turn may use the cached copy
+    assert worker_a.load("s1", validate=False)["version"] == 1
+
+    latest = worker_a.load("s1")
+    assert latest["version"] == 2
+    assert latest["state"]["current_order"] == {"order_id": "12345"}
+
+
+def test_loaded_session_can_be_mutated_without_touching_the_cache(db_path):
+    store = SQLiteSessionStore(db_path)
+    session = store.load("s1")
+    session["messages"].append({"role": "user", "content": "hi"})
+    store.save(session)
+
+    loaded = store.load("s1")
+    loaded["messages"].append({"role": "assistant", "content": "not saved"})
+    assert store.load("s1")["messages"] == [{"role": "user", "content": "hi"}]
+
+
+def test_concurrent_create_raises_conflict(db_path):
+    worker_a, worker_b = two_workers(db_path)
+    first = worker_a.load("s1")
+    second = worker_b.load("s1")
+    assert first["version"] == second["version"] == 0
+
+    worker_a.save(first)
+    with pytest.raises(SessionConflictError):
+        worker_b.save(second)
+
+    assert worker_b.load("s1")["version"] == 1
+
+
+def test_save_trims_messages_to_limit(db_path):
+    store = SQLiteSessionStore(db_path, message_limit=3)
+    session = store.load("s1")
+    session["messages"] = [{"role": "user", "content": str(i)} for i in range(5)]
+    store.save(session)
+
+    assert [message["content"] for message in store.load("s1")["messages"]] == ["2", "3", "4"]